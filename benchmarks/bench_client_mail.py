@@ -0,0 +1,105 @@
+import argparse
+import json
+import shutil
+import smtplib
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.bench_process_docs import StubBot
+from benchmarks.bench_send_mail import make_letters
+from benchmarks.smtp_sink import SMTPSink
+from src.data import Date, TimeRange
+from src.notification import (
+    Mail,
+    client_message_chunks,
+    load_client_emails,
+    send_client_mails,
+)
+from src.utils.smtp_utils import send_stream
+
+
+def send_per_connection(
+    mail_info: Mail, client_emails: dict[str, list[str]], suffix: str
+) -> None:
+    for doc_path in sorted(mail_info.attachment_folder_path.glob("*.docx")):
+        recipients = client_emails[doc_path.stem.removesuffix(suffix)]
+        with smtplib.SMTP(mail_info.server, mail_info.port) as smtp:
+            chunks = client_message_chunks(mail_info, recipients, doc_path)
+            send_stream(smtp, mail_info.sender, recipients, chunks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-client mailing")
+    parser.add_argument("--letters", type=int, default=500)
+    parser.add_argument("--letter-size", type=int, default=40_000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4])
+    parser.add_argument(
+        "--max-messages-per-connection",
+        type=int,
+        default=0,
+        help="make the sink drop connections to exercise reconnects",
+    )
+    args = parser.parse_args()
+
+    run_date = Date.to_date(datetime(2026, 10, 14))
+    t_range = TimeRange(
+        start=run_date, end=Date.to_date(run_date.dt + timedelta(days=16))
+    )
+    suffix = f"_{t_range.end.short}"
+
+    tmp_folder = Path(tempfile.mkdtemp(prefix="bench_client_mail_"))
+    try:
+        doc_paths = make_letters(tmp_folder / "docs", args.letters, args.letter_size)
+        mapping_path = tmp_folder / "client_emails.json"
+        mapping_path.write_text(
+            json.dumps(
+                {
+                    doc_path.stem.removesuffix(suffix): f"client{idx}@example.com"
+                    for idx, doc_path in enumerate(doc_paths)
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        client_emails = load_client_emails(mapping_path)
+
+        runs = [("connection_per_message", None)]
+        runs += [(f"pool_{size}", size) for size in args.connections]
+        for name, size in runs:
+            with SMTPSink(
+                keep_messages=False,
+                max_messages_per_connection=args.max_messages_per_connection,
+            ) as sink:
+                mail_info = Mail(
+                    server="127.0.0.1",
+                    sender="robot@example.com",
+                    recipients="",
+                    subject="Уведомление о плановом погашении",
+                    attachment_folder_path=tmp_folder / "docs",
+                    port=sink.port,
+                )
+                start = perf_counter()
+                if size is None:
+                    send_per_connection(mail_info, client_emails, suffix)
+                else:
+                    send_client_mails(
+                        mail_info=mail_info,
+                        t_range=t_range,
+                        bot=StubBot(),
+                        client_emails=client_emails,
+                        connections=size,
+                    )
+                elapsed = perf_counter() - start
+
+            print(
+                f"{name:<28}{elapsed:>10.3f}s{sink.message_count / elapsed:>10.0f} msg/s"
+                f"{sink.message_count:>8} sent{sink.connection_count:>6} connections"
+            )
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
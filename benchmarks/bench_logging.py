@@ -0,0 +1,83 @@
+import argparse
+import contextlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from rich.logging import RichHandler
+
+from src.utils import logger
+
+
+def setup_sync_logger(project_root: Path) -> None:
+    log_file = project_root / "sync.log"
+    file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    file_handler.setFormatter(
+        logging.Formatter(
+            "%(asctime).19s %(levelname)s %(name)s %(filename)s %(funcName)s : "
+            "%(message)s"
+        )
+    )
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(file_handler)
+    root.addHandler(RichHandler(omit_repeated_times=False, rich_tracebacks=True))
+
+
+def reset_logging() -> None:
+    logger.stop_logger()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def hot_loop(calls: int) -> float:
+    start = perf_counter()
+    for idx in range(calls):
+        logging.info(f'"ТОО Клиент {idx}_30.10.26.docx" saved...')
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-call logging cost")
+    parser.add_argument("--calls", type=int, default=5_000)
+    args = parser.parse_args()
+
+    setups = {
+        "sync_file_rich": lambda folder: setup_sync_logger(folder),
+        "queue_file_rich": lambda folder: logger.setup_logger(folder, json_logs=False),
+        "queue_file_rich_json": lambda folder: logger.setup_logger(
+            folder, json_logs=True
+        ),
+    }
+
+    results = []
+    for name, setup in setups.items():
+        folder = Path(tempfile.mkdtemp(prefix="bench_logging_"))
+        try:
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    setup(folder)
+                    caller_time = hot_loop(args.calls)
+                    start = perf_counter()
+                    reset_logging()
+                    drain_time = perf_counter() - start
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        results.append((name, caller_time, drain_time))
+
+    for name, caller_time, drain_time in results:
+        print(
+            f"{name:<24}{caller_time / args.calls * 1e6:>8.1f} us/call on caller"
+            f"{drain_time:>8.2f}s to drain",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import platform
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+
+from benchmarks.generate_data import SCALES, generate, get_reports
+from src import process_docs
+from src.data import Date
+from src.utils.cache import ParseCache
+from src.utils.docx_utils import DocxTemplate
+from src.utils.letter_template import LetterTemplate
+
+
+class StubBot:
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+
+    def send_message(self, message: str, *args, **kwargs) -> bool:
+        self.messages.append(message)
+        return True
+
+    def send_image(self, *args, **kwargs) -> bool:
+        return True
+
+
+class Timings:
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        yield
+        self.stages[name] = perf_counter() - start
+
+
+def bench(data_folder: Path, run_date: Date, workers: int = 1) -> Timings:
+    reports = get_reports(data_folder, run_date)
+    end_date = Date.to_date(run_date.dt + timedelta(days=16)).short
+    bot = StubBot()
+    timings = Timings()
+
+    docs_folder = Path(tempfile.mkdtemp(prefix="bench_docs_"))
+    try:
+        with timings.stage("parse_credits_c"):
+            credits_df = process_docs.read_credits(
+                reports.credit_contracts_fpath, engine="c"
+            )
+        if process_docs.pa_csv is not None:
+            with timings.stage("parse_credits_pyarrow"):
+                credits_df = process_docs.read_credits(
+                    reports.credit_contracts_fpath, engine="pyarrow"
+                )
+        with timings.stage("parse_zbrk_l_deashd4"):
+            df = process_docs.read_zbrk_l_deashd4(reports.zbrk_l_deashd4_xlsx_fpath)
+        with timings.stage("parse_concurrent"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                loaded = process_docs.submit_reports(
+                    executor=executor,
+                    cache=ParseCache(docs_folder / "cache"),
+                    reports=reports,
+                )
+                loaded.zbrk_l_deashd4.result()
+                loaded.credits.result()
+        with timings.stage("select"):
+            df = process_docs.select_repayments(df=df, end_dates=[end_date])
+        with timings.stage("parse_needed_credits"):
+            process_docs.read_needed_credits(
+                reports.credit_contracts_fpath,
+                contract_numbers=set(df["contract_number"]),
+            )
+        with timings.stage("attach_start_dates"):
+            df = process_docs.attach_start_dates(df=df, credits_df=credits_df, bot=bot)
+        with timings.stage("partition"):
+            letters = process_docs.collect_letters(
+                df=df,
+                docs_folder=docs_folder,
+                end_date=end_date,
+                incomplete_clients=set(),
+            )
+        with timings.stage("render"):
+            letter_template = LetterTemplate()
+            texts = [letter_template.render(letter) for letter in letters]
+        with timings.stage("save"):
+            template = DocxTemplate()
+            for letter, text in zip(letters, texts):
+                template.save(text, letter.doc_path)
+        if workers > 1:
+            with timings.stage(f"save_{workers}_workers"):
+                process_docs.write_letters(
+                    letters, template, letter_template, workers=workers
+                )
+    finally:
+        shutil.rmtree(docs_folder, ignore_errors=True)
+
+    timings.counts["rows"] = len(df)
+    timings.counts["letters"] = len(letters)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark process_docs stages")
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--data-folder", type=Path, help="reuse generated reports")
+    parser.add_argument("--run-date", default="14.10.26", help="dd.mm.yy")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--label", default="", help="e.g. release tag")
+    parser.add_argument("--output", type=Path, help="append results as JSON lines")
+    args = parser.parse_args()
+
+    run_date = Date.to_date(datetime.strptime(args.run_date, "%d.%m.%y"))
+    data_folder = args.data_folder or Path(tempfile.gettempdir()) / (
+        f"pay_notifications_bench_{args.scale}"
+    )
+    if not get_reports(data_folder, run_date).zbrk_l_deashd4_xlsx_fpath.exists():
+        print(f"Generating {args.scale} reports in {data_folder}...")
+        generate(data_folder, SCALES[args.scale], run_date)
+
+    timings = bench(data_folder, run_date, workers=args.workers)
+    for name, seconds in timings.stages.items():
+        print(f"{name:<28}{seconds:>10.3f}s")
+    for name, count in timings.counts.items():
+        print(f"{name:<28}{count:>11}")
+
+    if args.output:
+        result = {
+            "label": args.label,
+            "scale": args.scale,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "stages": timings.stages,
+            "counts": timings.counts,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
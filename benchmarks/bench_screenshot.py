@@ -0,0 +1,71 @@
+import argparse
+import io
+import random
+from time import perf_counter
+
+import PIL.Image as Image
+import PIL.ImageDraw as ImageDraw
+
+from benchmarks.bench_telegram import create_bot
+from benchmarks.telegram_stub import TelegramStub
+from src.utils.screenshot import ScreenshotSettings, encode_screenshot
+
+
+def make_desktop(width: int, height: int, seed: int = 0) -> Image.Image:
+    rnd = random.Random(seed)
+    media = Image.new("RGB", (width, height), (0, 99, 177))
+    draw = ImageDraw.Draw(media)
+    for _ in range(40):
+        left, top = rnd.randrange(width - 400), rnd.randrange(height - 300)
+        right, bottom = left + rnd.randrange(200, 900), top + rnd.randrange(150, 600)
+        draw.rectangle((left, top, right, bottom), fill=(240, 240, 240))
+        draw.rectangle((left, top, right, top + 24), fill=(0, 84, 166))
+        for y in range(top + 34, bottom - 12, 16):
+            text = "".join(rnd.choice("ABCDEFGH 0123456789.,") for _ in range(60))
+            draw.text((left + 8, y), text, fill=(20, 20, 20))
+    return media
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark screenshot encoding")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    media = make_desktop(args.width, args.height)
+
+    start = perf_counter()
+    image_stream = io.BytesIO()
+    media.save(image_stream, format="PNG")
+    elapsed = perf_counter() - start
+    print(
+        f"{'png_full_resolution':<28}{elapsed:>8.3f}s{len(image_stream.getvalue()):>12} B"
+    )
+
+    variants = {
+        "png_1920": ScreenshotSettings(format="PNG"),
+        "jpeg_70_1920": ScreenshotSettings(format="JPEG", quality=70),
+        "webp_70_1920": ScreenshotSettings(format="WEBP", quality=70),
+        "jpeg_70_full": ScreenshotSettings(format="JPEG", max_dimension=None),
+    }
+    for name, settings in variants.items():
+        start = perf_counter()
+        _, photo, _ = encode_screenshot(media, settings)
+        elapsed = perf_counter() - start
+        print(f"{name:<28}{elapsed:>8.3f}s{photo.getbuffer().nbytes:>12} B")
+
+    with TelegramStub() as stub:
+        bot = create_bot(stub, rate=10)
+        start = perf_counter()
+        bot.send_image(media)
+        enqueued = perf_counter() - start
+        bot.flush(timeout=60)
+        elapsed = perf_counter() - start
+    print(
+        f"{'send_image':<28}enqueue {enqueued * 1000:.1f}ms, delivered in "
+        f"{elapsed:.3f}s, {len(stub.photos)} photo(s) received"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.bench_process_docs import StubBot
+from benchmarks.smtp_sink import SMTPSink
+from src.data import Date, TimeRange
+from src.notification import Mail, send_mail
+
+
+def make_letters(folder: Path, count: int, size: int) -> list[Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    doc_paths = []
+    for idx in range(count):
+        doc_path = folder / f"ТОО Клиент {idx}_30.10.26.docx"
+        doc_path.write_bytes(idx.to_bytes(4) * (size // 4))
+        doc_paths.append(doc_path)
+    return doc_paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark send_mail")
+    parser.add_argument("--letters", type=int, default=1_000)
+    parser.add_argument("--letter-size", type=int, default=40_000)
+    parser.add_argument("--max-attachment-size", type=int, default=10 * 2**20)
+    parser.add_argument("--server-max-size", type=int, default=50 * 2**20)
+    parser.add_argument("--docs-folder", type=Path, help="use existing letters")
+    args = parser.parse_args()
+
+    run_date = Date.to_date(datetime(2026, 10, 14))
+    t_range = TimeRange(
+        start=run_date, end=Date.to_date(run_date.dt + timedelta(days=16))
+    )
+
+    tmp_folder = Path(tempfile.mkdtemp(prefix="bench_mail_"))
+    try:
+        docs_folder = args.docs_folder or tmp_folder
+        if not args.docs_folder:
+            make_letters(docs_folder, args.letters, args.letter_size)
+        doc_names = {doc_path.name for doc_path in docs_folder.glob("*.docx")}
+
+        with SMTPSink(max_size=args.server_max_size) as sink:
+            mail_info = Mail(
+                server="127.0.0.1",
+                sender="robot@example.com",
+                recipients="a@example.com;b@example.com",
+                subject="Отчет робота по плановым платежам",
+                attachment_folder_path=docs_folder,
+                max_attachment_size=args.max_attachment_size,
+                port=sink.port,
+            )
+            start = perf_counter()
+            success = send_mail(mail_info=mail_info, t_range=t_range, bot=StubBot())
+            elapsed = perf_counter() - start
+
+        received_names = []
+        for _, msg in sink.messages:
+            for part in msg.iter_attachments():
+                with zipfile.ZipFile(io.BytesIO(part.get_content())) as archive:
+                    received_names.extend(archive.namelist())
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    print(f"{'success':<28}{success!s:>11}")
+    print(f"{'send_mail':<28}{elapsed:>10.3f}s")
+    print(f"{'emails':<28}{len(sink.messages):>11}")
+    for _, msg in sink.messages:
+        print(f"  {msg['Subject']}")
+    print(f"{'letters match':<28}{sorted(received_names) == sorted(doc_names)!s:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+from time import perf_counter
+
+from benchmarks.telegram_stub import TelegramStub
+from src.notification import TelegramAPI
+
+
+def create_bot(stub: TelegramStub, rate: float) -> TelegramAPI:
+    os.environ.setdefault("TOKEN", "stub")
+    os.environ.setdefault("CHAT_ID", "0")
+    os.environ["TELEGRAM_RATE"] = str(rate)
+    bot = TelegramAPI()
+    bot.api_url = stub.api_url
+    return bot
+
+
+def run_scenario(
+    name: str, messages: int, latency: float, rate: float, statuses: list[str]
+) -> None:
+    with TelegramStub(latency=latency, statuses=statuses) as stub:
+        bot = create_bot(stub, rate)
+
+        start = perf_counter()
+        for idx in range(messages):
+            bot.send_message(f"{name}: status line {idx}")
+        enqueued = perf_counter() - start
+        delivered = bot.flush(timeout=120)
+        elapsed = perf_counter() - start
+
+    lines = [line for message in stub.messages for line in message.split("\n")]
+    statuses_seen = [status for _, status in stub.requests]
+    print(
+        f"{name:<16}enqueue {enqueued * 1000:>7.1f}ms  flush {elapsed:>6.2f}s  "
+        f"requests {len(stub.requests):>3} {statuses_seen}  "
+        f"connections {len(stub.client_ports)}  "
+        f"lines {len(lines)}/{messages}  delivered {delivered}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark TelegramAPI delivery")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rate", type=float, default=5.0)
+    args = parser.parse_args()
+
+    scenarios = {
+        "ok": [],
+        "rate_limited": ["429:2"],
+        "server_errors": ["502", "503"],
+        "bad_request": ["400"],
+    }
+    for name, statuses in scenarios.items():
+        run_scenario(name, args.messages, args.latency, args.rate, statuses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from src.data import Date, Reports
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+CURRENCIES = ["KZT", "KZT", "KZT", "USD", "EUR"]
+ZBRK_COLUMNS = [
+    "№",
+    "Номер договора",
+    "Клиент ",
+    "Валюта договора",
+    "Дата погашения по графику",
+    "Основной долг",
+    "Проценты",
+    "Отсроченные проценты",
+    "Комиссия",
+    "Филиал",
+]
+
+
+def get_reports(folder: Path, run_date: Date) -> Reports:
+    zbrk_l_deashd4_fpath = folder / f"ZBRK_L_DEASHD4_{run_date.short}.xls"
+    return Reports(
+        report_root_folder=folder,
+        docs_folder=folder / "docs",
+        credit_contracts_fpath=folder / f"credits_{run_date.short}.xls",
+        zbrk_l_deashd4_fpath=zbrk_l_deashd4_fpath,
+        zbrk_l_deashd4_xlsx_fpath=zbrk_l_deashd4_fpath.with_suffix(".xlsx"),
+    )
+
+
+def format_amount(rnd: random.Random, amount: float) -> float | str:
+    amount = round(amount, 2)
+    grouped = f"{amount:,.2f}"
+    match rnd.randrange(5):
+        case 0 | 1:
+            return amount
+        case 2:
+            return grouped.replace(",", " ")
+        case 3:
+            return grouped.replace(",", "\xa0").replace(".", ",")
+        case _:
+            return f" {amount:.2f} ".replace(".", ",")
+
+
+def write_credits(file_path: Path, contracts: list[tuple[str, str]]) -> None:
+    with open(file_path, "w", encoding="utf-16", newline="") as f:
+        f.write("Кредитные договора\n")
+        f.write("ID\tДата начала\tНомер договора\tКлиент\tСумма договора\tСтатус\n")
+        for idx, (contract_number, start_date) in enumerate(contracts, start=1):
+            f.write(
+                f"{idx}\t{start_date}\t{contract_number}\t\t{idx * 1000}.00\tДействует\n"
+            )
+
+
+def write_zbrk_l_deashd4(
+    file_path: Path,
+    contracts: list[tuple[str, str]],
+    end_date: Date,
+    rnd: random.Random,
+    sections: int,
+    target_share: float,
+) -> None:
+    clients = [f'ТОО "Клиент {idx}"' for idx in range(max(1, len(contracts) // 5))]
+    other_dates = [
+        Date.to_date(end_date.dt + timedelta(days=days)).short
+        for days in range(-16, 16)
+        if days != 0
+    ]
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Отчет ZBRK_L_DEASHD4"])
+    sheet.append([None, "АО «Банк Развития Казахстана»"])
+    sheet.append([None, f"Период: {other_dates[0]} - {other_dates[-1]}"])
+    sheet.append([])
+
+    section_size = -(-len(contracts) // sections)
+    for section in range(sections):
+        sheet.append([None, f"Филиал {section + 1}"])
+        sheet.append(ZBRK_COLUMNS)
+
+        section_contracts = contracts[
+            section * section_size : (section + 1) * section_size
+        ]
+        for idx, (contract_number, _) in enumerate(section_contracts, start=1):
+            if rnd.random() < target_share:
+                deadline_date = end_date.short
+            else:
+                deadline_date = rnd.choice(other_dates)
+            debt = rnd.uniform(1_000, 50_000_000) if rnd.random() < 0.6 else None
+            deferred_interest = rnd.uniform(1, 100_000) if rnd.random() < 0.2 else None
+            sheet.append(
+                [
+                    idx,
+                    contract_number,
+                    rnd.choice(clients),
+                    rnd.choice(CURRENCIES),
+                    deadline_date,
+                    format_amount(rnd, debt) if debt else None,
+                    format_amount(rnd, rnd.uniform(100, 5_000_000)),
+                    format_amount(rnd, deferred_interest)
+                    if deferred_interest
+                    else None,
+                    0,
+                    f"Филиал {section + 1}",
+                ]
+            )
+
+        sheet.append([None, "Всего", None, None, None, 0, 0, 0, 0])
+        sheet.append([])
+
+    workbook.save(file_path)
+
+
+def generate(
+    folder: Path,
+    contracts_count: int,
+    run_date: Date,
+    seed: int = 0,
+    sections: int = 1,
+    target_share: float = 0.3,
+) -> Reports:
+    folder.mkdir(parents=True, exist_ok=True)
+    reports = get_reports(folder, run_date)
+    end_date = Date.to_date(run_date.dt + timedelta(days=16))
+
+    rnd = random.Random(seed)
+    contracts = []
+    for idx in range(contracts_count):
+        start_dt = datetime(2010, 1, 1) + timedelta(days=rnd.randrange(5_000))
+        contracts.append(
+            (f"{rnd.randint(1, 99)}-КД/{idx:07d}", Date.to_date(start_dt).long)
+        )
+
+    write_credits(reports.credit_contracts_fpath, contracts)
+
+    rnd.shuffle(contracts)
+    write_zbrk_l_deashd4(
+        reports.zbrk_l_deashd4_xlsx_fpath,
+        contracts=contracts,
+        end_date=end_date,
+        rnd=rnd,
+        sections=sections,
+        target_share=target_share,
+    )
+
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic credits and ZBRK_L_DEASHD4 reports"
+    )
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--run-date", default="14.10.26", help="dd.mm.yy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sections", type=int, default=1)
+    parser.add_argument("--target-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    run_date = Date.to_date(datetime.strptime(args.run_date, "%d.%m.%y"))
+    reports = generate(
+        folder=args.folder,
+        contracts_count=SCALES[args.scale],
+        run_date=run_date,
+        seed=args.seed,
+        sections=args.sections,
+        target_share=args.target_share,
+    )
+    print(f"{reports.credit_contracts_fpath}\n{reports.zbrk_l_deashd4_xlsx_fpath}")
+
+
+if __name__ == "__main__":
+    main()
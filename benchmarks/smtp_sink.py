@@ -0,0 +1,98 @@
+import socketserver
+import threading
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import Self
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    server: "SMTPSink"
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        with self.server.lock:
+            self.server.connection_count += 1
+        self.reply("220 smtp-sink ready")
+        recipients: list[str] = []
+        received_count = 0
+        while line := self.rfile.readline():
+            command = line.decode("ascii", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply(f"250-smtp-sink\r\n250 SIZE {self.server.max_size}")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.partition(":")[2].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.receive_data(recipients)
+                received_count += 1
+                if received_count == self.server.max_messages_per_connection:
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def receive_data(self, recipients: list[str]) -> None:
+        lines = []
+        size = 0
+        while (line := self.rfile.readline()) not in (b".\r\n", b""):
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+            size += len(line)
+
+        if size > self.server.max_size:
+            self.reply("552 Message size exceeds fixed maximum message size")
+            return
+
+        self.server.add_message(recipients, b"".join(lines))
+        self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        max_size: int = 50 * 2**20,
+        keep_messages: bool = True,
+        max_messages_per_connection: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.max_size = max_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.keep_messages = keep_messages
+        self.messages: list[tuple[list[str], EmailMessage]] = []
+        self.message_count = 0
+        self.connection_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def add_message(self, recipients: list[str], data: bytes) -> None:
+        with self.lock:
+            self.message_count += 1
+            if self.keep_messages:
+                msg = message_from_bytes(data, policy=policy.default)
+                self.messages.append((recipients, msg))
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,83 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+from typing import Self
+from urllib.parse import parse_qs
+
+
+class TelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "TelegramStub"
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status, retry_after = self.server.next_status()
+        self.server.record(self, body, status)
+        sleep(self.server.latency)
+
+        if status == 200:
+            data = {"ok": True, "result": {}}
+        elif status == 429:
+            data = {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }
+        else:
+            data = {"ok": False, "error_code": status, "description": "Stub error"}
+
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class TelegramStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, statuses: list[str] | None = None) -> None:
+        super().__init__(("127.0.0.1", 0), TelegramHandler)
+        self.latency = latency
+        self.statuses = list(statuses or [])
+        self.messages: list[str] = []
+        self.photos: list[bytes] = []
+        self.requests: list[tuple[float, int]] = []
+        self.client_ports: set[int] = set()
+        self.lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/botstub/"
+
+    def next_status(self) -> tuple[int, int]:
+        with self.lock:
+            if not self.statuses:
+                return 200, 0
+            status, _, retry_after = self.statuses.pop(0).partition(":")
+            return int(status), int(retry_after or 0)
+
+    def record(self, handler: TelegramHandler, body: bytes, status: int) -> None:
+        with self.lock:
+            self.requests.append((monotonic(), status))
+            self.client_ports.add(handler.client_address[1])
+            if status != 200:
+                return
+            if handler.path.endswith("sendMessage"):
+                self.messages.append(parse_qs(body.decode())["text"][0])
+            else:
+                self.photos.append(body)
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
@@ -38,3 +38,25 @@ class Reports(NamedTuple):
     credit_contracts_fpath: Path
     zbrk_l_deashd4_fpath: Path
     zbrk_l_deashd4_xlsx_fpath: Path
+
+
+class LetterLine(NamedTuple):
+    idx: int
+    contract_number: str
+    start_date: str
+    interest: int
+    debt: int | None
+
+
+class CurrencyBlock(NamedTuple):
+    currency: str
+    total: int
+    lines: list[LetterLine]
+
+
+class Letter(NamedTuple):
+    client: str
+    deadline_date: str
+    has_debt: bool
+    currencies: list[CurrencyBlock]
+    doc_path: Path
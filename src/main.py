@@ -31,4 +31,9 @@ if __name__ == "__main__":
     kill_all_processes("WINWORD")
 
     telegram_bot = TelegramAPI()
-    robot.run(bot=telegram_bot, project_folder=project_folder, env_path=env_path)
+    robot.run(
+        bot=telegram_bot,
+        project_folder=project_folder,
+        env_path=env_path,
+        run_dates=robot.parse_run_dates(sys.argv[1:]),
+    )
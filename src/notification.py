@@ -1,26 +1,48 @@
 import email.utils
 import io
+import json
 import logging
 import os
-import shutil
+import queue
+import random
 import smtplib
+import threading
 import traceback
 import urllib.parse
-from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from functools import wraps
+from functools import partial, wraps
 from pathlib import Path
-from typing import NamedTuple, Callable
+from time import perf_counter, sleep
+from typing import Callable, Iterator, NamedTuple
 
 import requests
 import requests.adapters
-from requests.exceptions import SSLError
-from typing import cast
 import PIL.Image as Image
 import PIL.ImageGrab as ImageGrab
 
 from src.data import TimeRange
+from src.utils.manifest import MANIFEST_FILE_NAME, read_manifest
+from src.utils.metrics import metrics
+from src.utils.rate_limit import TokenBucket
+from src.utils.screenshot import encode_screenshot, screenshot_settings_from_env
+from src.utils.smtp_utils import (
+    MailJob,
+    SMTPPool,
+    attachment_size_limit,
+    iter_message,
+    send_stream,
+    server_size_limit,
+)
+from src.utils.zip_utils import build_archive, split_by_size
+
+MAX_ATTACHMENT_SIZE = 20 * 2**20
+TELEGRAM_MESSAGE_LIMIT = 4096
+REQUEST_TIMEOUT = (10, 60)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+FLUSH_TIMEOUT = 120.0
 
 
 def get_secrets() -> tuple[str, str]:
@@ -35,18 +57,171 @@ def get_secrets() -> tuple[str, str]:
     return token, chat_id
 
 
+class TelegramRejectedError(Exception):
+    pass
+
+
+class Notification(NamedTuple):
+    kind: str
+    payload: str | Image.Image
+    use_md: bool = False
+
+
+def split_message(message: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> list[str]:
+    return [message[i : i + limit] for i in range(0, len(message), limit)] or [""]
+
+
+def create_session() -> requests.Session:
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def log_response(response: requests.Response) -> None:
+    try:
+        data = response.json()
+    except ValueError:
+        data = response.text[:200]
+    logging.info(f"{response.status_code=}")
+    logging.info(f"{data=}")
+
+
+def retry_after(response: requests.Response) -> float | None:
+    if response.status_code != 429:
+        return None
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return float(response.headers.get("Retry-After", BACKOFF_MAX))
+
+
 class TelegramAPI:
     def __init__(self) -> None:
-        self.session = requests.Session()
-        self.session.mount("http://", requests.adapters.HTTPAdapter(max_retries=5))
+        self.session = create_session()
+        self.limiter = TokenBucket(
+            rate=float(os.getenv("TELEGRAM_RATE", "0.33")), capacity=3
+        )
+        self.screenshot_settings = screenshot_settings_from_env()
         self.token, self.chat_id = get_secrets()
+        logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
         self.api_url = f"https://api.telegram.org/bot{self.token}/"
 
+        self.queue: queue.Queue[Notification] = queue.Queue()
+        self.worker = threading.Thread(
+            target=self.deliver_forever, name="telegram", daemon=True
+        )
+        self.worker.start()
+
+    def send_message(self, message: str, use_md: bool = False) -> bool:
+        if not message.strip():
+            logging.warning("Skipping empty Telegram message")
+            return False
+        self.queue.put(Notification(kind="message", payload=message, use_md=use_md))
+        return True
+
+    def send_image(
+        self,
+        media: Image.Image | None = None,
+        bbox: tuple[int, int, int, int] | None = None,
+    ) -> bool:
+        if media is None:
+            if not self.screenshot_settings.crop_to_window:
+                bbox = None
+            media = ImageGrab.grab(bbox=bbox, all_screens=bbox is not None)
+        self.queue.put(Notification(kind="image", payload=media))
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        if timeout is None:
+            timeout = float(os.getenv("TELEGRAM_FLUSH_TIMEOUT", FLUSH_TIMEOUT))
+        with self.queue.all_tasks_done:
+            delivered = self.queue.all_tasks_done.wait_for(
+                lambda: self.queue.unfinished_tasks == 0, timeout=timeout
+            )
+            if not delivered:
+                logging.warning(
+                    f"Dropping {self.queue.unfinished_tasks} undelivered Telegram "
+                    f"notifications after waiting {timeout:.0f}s"
+                )
+        return delivered
+
+    def deliver_forever(self) -> None:
+        pending: Notification | None = None
+        while True:
+            notification = pending or self.queue.get()
+            pending = None
+            messages = [notification.payload]
+
+            if notification.kind == "message" and not notification.use_md:
+                message = notification.payload
+                while True:
+                    try:
+                        next_notification = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if (
+                        next_notification.kind == "message"
+                        and not next_notification.use_md
+                        and len(message) + 1 + len(next_notification.payload)
+                        <= TELEGRAM_MESSAGE_LIMIT
+                    ):
+                        message += "\n" + next_notification.payload
+                        messages.append(next_notification.payload)
+                    else:
+                        pending = next_notification
+                        break
+                notification = notification._replace(payload=message)
+
+            try:
+                self.deliver_batch(notification, messages)
+            except requests.exceptions.RequestException as err:
+                logging.error(self.describe_error(err))
+            except Exception as err:
+                logging.exception(err)
+            finally:
+                for _ in messages:
+                    self.queue.task_done()
+
+    def deliver_batch(
+        self, notification: Notification, messages: list[str | Image.Image]
+    ) -> None:
+        try:
+            self.deliver(notification)
+        except TelegramRejectedError as err:
+            if len(messages) == 1:
+                raise
+            logging.warning(f"{err}. Resending {len(messages)} messages one by one...")
+            for message in messages:
+                try:
+                    self.deliver(notification._replace(payload=message))
+                except TelegramRejectedError as message_err:
+                    logging.error(f"{message_err}. Message dropped")
+
+    def deliver(self, notification: Notification) -> None:
+        if notification.kind == "image":
+            photo = encode_screenshot(notification.payload, self.screenshot_settings)
+            file_name, image_stream, _ = photo
+            size = image_stream.getbuffer().nbytes
+            logging.info(f"Screenshot encoded: {file_name}, {size} bytes")
+            self.with_retry(partial(self.post_image, photo))
+            return
+        for message in split_message(notification.payload):
+            self.send_with_retry(message, use_md=notification.use_md)
+
+    def describe_error(self, err: Exception) -> str:
+        return f"{type(err).__name__}: {str(err).replace(self.token, '<TOKEN>')}"
+
     def reload_session(self) -> None:
-        self.session = requests.Session()
-        self.session.mount("http://", requests.adapters.HTTPAdapter(max_retries=5))
+        self.session.close()
+        self.session = create_session()
 
-    def send_message(
+    def post_message(
         self, message: str, use_session: bool = True, use_md: bool = False
     ) -> bool:
         send_data: dict[str, str | None] = {
@@ -61,76 +236,79 @@ class TelegramAPI:
         url = urllib.parse.urljoin(self.api_url, "sendMessage")
         send_data["text"] = message
 
-        try:
-            if use_session:
-                response = self.session.post(
-                    url, data=send_data, files=files, verify=False
-                )
-            else:
-                response = requests.post(url, data=send_data, files=files, verify=False)
-
-            data = "" if not hasattr(response, "json") else response.json()
-            logging.info(f"{response.status_code=}")
-            logging.info(f"{data=}")
-            response.raise_for_status()
-            return response.status_code == 200
-        except SSLError as err:
-            logging.exception(err)
-            return False
-
-    def send_image(
-        self, media: Image.Image | None = None, use_session: bool = True
+        if use_session:
+            response = self.session.post(
+                url, data=send_data, files=files, verify=False, timeout=REQUEST_TIMEOUT
+            )
+        else:
+            response = requests.post(
+                url, data=send_data, files=files, verify=False, timeout=REQUEST_TIMEOUT
+            )
+
+        log_response(response)
+        response.raise_for_status()
+        return response.status_code == 200
+
+    def post_image(
+        self, photo: tuple[str, io.BytesIO, str], use_session: bool = True
     ) -> bool:
-        try:
-            send_data = {"chat_id": self.chat_id}
+        send_data = {"chat_id": self.chat_id}
+        photo[1].seek(0)
 
-            url = urllib.parse.urljoin(self.api_url, "sendPhoto")
+        url = urllib.parse.urljoin(self.api_url, "sendPhoto")
 
-            image_stream = io.BytesIO()
-            if media is None:
-                media = ImageGrab.grab()
-            media.save(image_stream, format="PNG")
-            image_stream.seek(0)
-            raw_io_base_stream = cast(io.RawIOBase, image_stream)
-            buffered_reader = io.BufferedReader(raw_io_base_stream)
-            files = {"photo": buffered_reader}
+        files = {"photo": photo}
 
-            if use_session:
-                response = self.session.post(url, data=send_data, files=files)
-            else:
-                response = requests.post(url, data=send_data, files=files)
-
-            data = "" if not hasattr(response, "json") else response.json()
-            logging.info(f"{response.status_code=}")
-            logging.info(f"{data=}")
-            response.raise_for_status()
-            return response.status_code == 200
-        except requests.exceptions.ConnectionError as exc:
-            logging.exception(exc)
-            return False
+        if use_session:
+            response = self.session.post(
+                url, data=send_data, files=files, timeout=REQUEST_TIMEOUT
+            )
+        else:
+            response = requests.post(
+                url, data=send_data, files=files, timeout=REQUEST_TIMEOUT
+            )
 
-    def send_with_retry(
-        self,
-        message: str,
-    ) -> bool:
-        retry = 0
-        while retry < 5:
+        log_response(response)
+        response.raise_for_status()
+        return response.status_code == 200
+
+    def with_retry(self, post: Callable[[bool], bool]) -> bool:
+        for attempt in range(MAX_ATTEMPTS):
+            self.limiter.acquire()
             try:
-                use_session = retry < 5
-                success = self.send_message(message, use_session)
-                return success
+                return post(attempt < MAX_ATTEMPTS - 1)
+            except requests.exceptions.HTTPError as err:
+                response = err.response
+                if (delay := retry_after(response)) is not None:
+                    logging.warning(f"Rate limited by Telegram for {delay}s")
+                elif response.status_code >= 500:
+                    delay = backoff_delay(attempt)
+                else:
+                    raise TelegramRejectedError(
+                        f"Telegram rejected the request with {response.status_code=}"
+                    ) from None
             except (
                 requests.exceptions.ConnectionError,
-                requests.exceptions.SSLError,
-                requests.exceptions.HTTPError,
-            ) as e:
+                requests.exceptions.Timeout,
+            ) as err:
                 self.reload_session()
-                logging.exception(e)
-                logging.warning(f"{e} intercepted. Retry {retry + 1}/10")
-                retry += 1
+                logging.warning(self.describe_error(err))
+                delay = backoff_delay(attempt)
+
+            if attempt < MAX_ATTEMPTS - 1:
+                logging.warning(
+                    f"Retry {attempt + 1}/{MAX_ATTEMPTS - 1} in {delay:.1f}s..."
+                )
+                sleep(delay)
 
+        logging.error(f"Giving up after {MAX_ATTEMPTS} attempts")
         return False
 
+    def send_with_retry(self, message: str, use_md: bool = False) -> bool:
+        return self.with_retry(
+            lambda use_session: self.post_message(message, use_session, use_md)
+        )
+
 
 def handle_error(func: Callable[..., any]) -> Callable[..., any]:
     @wraps(func)
@@ -151,6 +329,7 @@ def handle_error(func: Callable[..., any]) -> Callable[..., any]:
 
             if bot:
                 bot.send_message(error_msg)
+                bot.flush()
             raise error
 
     return wrapper
@@ -162,64 +341,218 @@ class Mail(NamedTuple):
     recipients: str
     subject: str
     attachment_folder_path: Path
+    max_attachment_size: int = MAX_ATTACHMENT_SIZE
+    port: int = 25
 
 
-def is_folder_empty(folder_path: Path) -> bool:
-    for _ in folder_path.iterdir():
-        return False
-    return True
-
-
-def send_mail(mail_info: Mail, t_range: TimeRange, bot: TelegramAPI) -> bool:
-    recipients_lst: list[str] = mail_info.recipients.split(";")
-
+def create_message(mail_info: Mail, subject: str) -> MIMEMultipart:
     msg = MIMEMultipart()
     msg["From"] = mail_info.sender
     msg["To"] = mail_info.recipients
     msg["Date"] = email.utils.formatdate(localtime=True)
-    msg["Subject"] = mail_info.subject
+    msg["Subject"] = subject
+    return msg
+
+
+@metrics.timed("send_mail")
+def send_mail(mail_info: Mail, t_range: TimeRange, bot: TelegramAPI) -> bool:
+    recipients_lst: list[str] = mail_info.recipients.split(";")
 
     body = mail_info.subject
 
-    if is_folder_empty(mail_info.attachment_folder_path):
+    doc_paths = sorted(mail_info.attachment_folder_path.glob("*.docx"))
+
+    if not doc_paths:
         body += f"\n\nНа {t_range.end.short} г. нет плановых платежей по займам."
         bot.send_message("No documents")
     else:
-        bot.send_message(
-            f"{len(os.listdir(mail_info.attachment_folder_path))} new documents"
-        )
-
-        archive_name = f"Documents_{t_range.end.short}"
-        original_zip_path = shutil.make_archive(
-            base_name=archive_name,
-            format="zip",
-            root_dir=mail_info.attachment_folder_path,
-        )
-        archive_name = f"{archive_name}.zip"
-        doc_archive_path = mail_info.attachment_folder_path / archive_name
-        shutil.move(original_zip_path, doc_archive_path)
-
-        with open(doc_archive_path, "rb") as f:
-            part = MIMEApplication(f.read())
-        part.add_header("Content-Disposition", "attachment", filename=archive_name)
-        msg.attach(part)
-
-    msg.attach(MIMEText(body, "html", "utf-8"))
+        bot.send_message(f"{len(doc_paths)} new documents")
+        metrics.count("mail_documents", len(doc_paths))
 
     try:
-        with smtplib.SMTP(mail_info.server, 25) as smtp:
-            response = smtp.sendmail(mail_info.sender, recipients_lst, msg.as_string())
-            if response:
-                logging.error("Failed to send email to the following recipients:")
-                for recipient, error in response.items():
-                    logging.error(f"{recipient}: {error}")
-                bot.send_message("Email sent unsuccessfully...")
-                return False
-            else:
-                logging.info("Email sent successfully...")
-                bot.send_message("Email sent successfully...")
-                return True
+        with smtplib.SMTP(mail_info.server, mail_info.port) as smtp:
+            message_size = mail_info.max_attachment_size
+            if server_size := server_size_limit(smtp):
+                message_size = min(message_size, server_size)
+            doc_groups: list[list[Path]] = [[]]
+            if doc_paths:
+                doc_groups = split_by_size(
+                    doc_paths, attachment_size_limit(message_size)
+                )
+                if len(doc_groups) > 1:
+                    logging.info(f"Documents are split into {len(doc_groups)} emails")
+
+            for idx, group in enumerate(doc_groups, start=1):
+                subject = mail_info.subject
+                archive_name = f"Documents_{t_range.end.short}.zip"
+                if len(doc_groups) > 1:
+                    subject += f" ({idx}/{len(doc_groups)})"
+                    archive_name = f"Documents_{t_range.end.short}_{idx}.zip"
+
+                msg = create_message(mail_info, subject)
+                msg.attach(MIMEText(body, "html", "utf-8"))
+                if not group:
+                    response = send_stream(
+                        smtp, mail_info.sender, recipients_lst, iter_message(msg, None)
+                    )
+                else:
+                    with build_archive(group) as archive:
+                        chunks = iter_message(msg, archive, archive_name)
+                        response = send_stream(
+                            smtp, mail_info.sender, recipients_lst, chunks
+                        )
+
+                if response:
+                    logging.error("Failed to send email to the following recipients:")
+                    for recipient, error in response.items():
+                        logging.error(f"{recipient}: {error}")
+                    bot.send_message("Email sent unsuccessfully...")
+                    return False
+                logging.info(f"Email {idx}/{len(doc_groups)} sent successfully...")
+                metrics.count("emails_sent", 1)
+
+            bot.send_message("Email sent successfully...")
+            return True
     except smtplib.SMTPException as e:
         logging.error(f"Failed to send email: {e}")
         bot.send_message("Email sent unsuccessfully...")
         return False
+
+
+MAIL_RESULTS_FILE_NAME = ".mail_results.json"
+
+
+def read_mail_results(results_path: Path) -> dict[str, dict]:
+    if not results_path.exists():
+        return {}
+    try:
+        return json.loads(results_path.read_text(encoding="utf-8"))["letters"]
+    except (OSError, ValueError, KeyError) as err:
+        logging.warning(f"Unable to read {results_path.name}: {err!r}")
+        return {}
+
+
+def load_client_emails(mapping_path: Path) -> dict[str, list[str]]:
+    mapping = json.loads(mapping_path.read_text(encoding="utf-8"))
+    return {
+        client.replace('"', ""): [e.strip() for e in emails.split(";") if e.strip()]
+        for client, emails in mapping.items()
+    }
+
+
+def client_message_chunks(
+    mail_info: Mail, recipients: list[str], doc_path: Path
+) -> Iterator[bytes]:
+    msg = create_message(
+        mail_info._replace(recipients=", ".join(recipients)), mail_info.subject
+    )
+    msg.attach(MIMEText(mail_info.subject, "html", "utf-8"))
+    return iter_message(msg, io.BytesIO(doc_path.read_bytes()), doc_path.name)
+
+
+@metrics.timed("send_client_mails")
+def send_client_mails(
+    mail_info: Mail,
+    t_range: TimeRange,
+    bot: TelegramAPI,
+    client_emails: dict[str, list[str]],
+    connections: int = 1,
+) -> dict[str, dict]:
+    doc_paths = sorted(mail_info.attachment_folder_path.glob("*.docx"))
+    suffix = f"_{t_range.end.short}"
+
+    results_path = mail_info.attachment_folder_path / MAIL_RESULTS_FILE_NAME
+    previous_results = read_mail_results(results_path)
+    manifest_path = mail_info.attachment_folder_path / MANIFEST_FILE_NAME
+    digests = read_manifest(manifest_path).get("letters", {})
+
+    results: dict[str, dict] = {}
+    skipped_names: list[str] = []
+    already_sent_count = 0
+    jobs: list[MailJob] = []
+    job_doc_paths: list[Path] = []
+    for doc_path in doc_paths:
+        client = doc_path.stem.removesuffix(suffix)
+        recipients = client_emails.get(client)
+        if not recipients:
+            logging.warning(f"No email address for {client}. Skipping...")
+            skipped_names.append(doc_path.name)
+            continue
+
+        digest = digests.get(doc_path.name)
+        previous = previous_results.get(doc_path.name, {})
+        sent_before = set()
+        if digest is not None and previous.get("digest") == digest:
+            sent_before = {
+                recipient
+                for recipient, status in previous.get("recipients", {}).items()
+                if status == "sent"
+            }
+        results[doc_path.name] = {
+            "digest": digest,
+            "recipients": {r: "sent" for r in recipients if r in sent_before},
+        }
+        already_sent_count += len(results[doc_path.name]["recipients"])
+
+        recipients = [r for r in recipients if r not in sent_before]
+        if not recipients:
+            logging.info(f'"{doc_path.name}" was already sent. Skipping...')
+            continue
+        jobs.append(
+            MailJob(
+                sender=mail_info.sender,
+                recipients=recipients,
+                make_chunks=partial(
+                    client_message_chunks, mail_info, recipients, doc_path
+                ),
+            )
+        )
+        job_doc_paths.append(doc_path)
+
+    start = perf_counter()
+    with SMTPPool(mail_info.server, mail_info.port, size=connections) as pool:
+        job_results = pool.send_all(jobs)
+    elapsed = perf_counter() - start
+
+    sent_count = failed_count = 0
+    for doc_path, job, job_result in zip(job_doc_paths, jobs, job_results):
+        recipient_results = results[doc_path.name]["recipients"]
+        for recipient in job.recipients:
+            if isinstance(job_result, Exception):
+                error = repr(job_result)
+            elif recipient in job_result:
+                error = repr(job_result[recipient])
+            else:
+                error = None
+
+            if error is None:
+                recipient_results[recipient] = "sent"
+                sent_count += 1
+            else:
+                recipient_results[recipient] = error
+                failed_count += 1
+                logging.error(
+                    f'Failed to send "{doc_path.name}" to {recipient}: {error}'
+                )
+
+    metrics.count("client_emails_sent", sent_count)
+    metrics.count("client_emails_failed", failed_count)
+
+    results_path.write_text(
+        json.dumps(
+            {"letters": results, "without_address": skipped_names},
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+    msg = (
+        f"Client emails for {t_range.end.short}: {sent_count} sent, "
+        f"{failed_count} failed, {already_sent_count} sent before, "
+        f"{len(skipped_names)} letters without address "
+        f"({len(jobs)} messages in {elapsed:.1f}s over {connections} connections)"
+    )
+    logging.info(msg)
+    bot.send_message(msg)
+    return results
@@ -1,174 +1,600 @@
+import codecs
+import hashlib
 import logging
+import mmap
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, NamedTuple
 
-import docx
 import numpy as np
 import pandas as pd
 
-from src.data import Reports
-from src.notification import TelegramAPI
-
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
 
-def run(reports: Reports, end_date: str, bot: TelegramAPI) -> None:
-    credit_columns = {
-        "ID": "ID",
-        "Дата начала": "start_date",
-        "Номер договора": "contract_number",
-    }
+from src.data import CurrencyBlock, Letter, LetterLine, Reports
+from src.notification import TelegramAPI
+from src.utils.cache import ParseCache
+from src.utils.docx_utils import DocxTemplate
+from src.utils.letter_template import DEFAULT_LETTER_TEMPLATE_PATH, LetterTemplate
+from src.utils.manifest import MANIFEST_FILE_NAME, DocsManifest
+from src.utils.metrics import metrics
+from src.utils.xlsx_reader import iter_sheet_rows
+
+
+CREDIT_COLUMNS = {
+    "ID": "ID",
+    "Дата начала": "start_date",
+    "Номер договора": "contract_number",
+}
+DEADLINE_FORMAT = "%d.%m.%y"
+CATEGORY_COLUMNS = ["client", "contract_currency", "contract_number"]
+AMOUNT_COLUMNS = ["percentages", "deferred_interest", "debt"]
+
+
+def convert_cell(value: Any) -> Any:
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, date):
+        return pd.Timestamp(value)
+    return value
+
+
+def read_credits(file_path: Path, engine: str = "auto") -> pd.DataFrame:
+    if engine == "auto":
+        engine = "c" if pa_csv is None else "pyarrow"
+
+    if engine == "pyarrow":
+        with (
+            open(file_path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            data = codecs.decode(mm, "utf-16").encode("utf-8")
+
+        try:
+            credits_df = pa_csv.read_csv(
+                pa.py_buffer(data),
+                read_options=pa_csv.ReadOptions(skip_rows=1),
+                parse_options=pa_csv.ParseOptions(delimiter="\t"),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=list(CREDIT_COLUMNS.keys()),
+                    column_types={column: pa.string() for column in CREDIT_COLUMNS},
+                    strings_can_be_null=True,
+                ),
+            ).to_pandas()
+        except pa.ArrowInvalid as err:
+            logging.warning(
+                f"pyarrow is unable to parse {file_path.name}: {err}. "
+                "Falling back to the C engine..."
+            )
+            engine = "c"
 
-    credits_df = (
-        pd.read_csv(
-            reports.credit_contracts_fpath,
+    if engine == "c":
+        credits_df = pd.read_csv(
+            file_path,
             sep="\t",
             skiprows=1,
             encoding="utf-16",
-            usecols=list(credit_columns.keys()),
+            usecols=list(CREDIT_COLUMNS.keys()),
+            dtype=str,
             engine="c",
         )
-        .rename(columns=credit_columns)
+
+    return (
+        credits_df.rename(columns=CREDIT_COLUMNS)
         .dropna(axis=1, how="all")
         .dropna(subset=["ID"])
     )
 
-    zbrk_l_deashd4_dirty_df = pd.read_excel(
-        reports.zbrk_l_deashd4_xlsx_fpath, header=None, engine="calamine"
+
+def read_needed_credits(
+    file_path: Path, contract_numbers: set[str], chunksize: int = 100_000
+) -> pd.DataFrame:
+    remaining_contracts = set(contract_numbers)
+    chunks = []
+
+    with pd.read_csv(
+        file_path,
+        sep="\t",
+        skiprows=1,
+        encoding="utf-16",
+        usecols=list(CREDIT_COLUMNS.keys()),
+        dtype=str,
+        engine="c",
+        chunksize=chunksize,
+    ) as reader:
+        for chunk in reader:
+            chunk = chunk[chunk["Номер договора"].isin(contract_numbers)]
+            chunks.append(chunk)
+            remaining_contracts.difference_update(chunk["Номер договора"])
+            if not remaining_contracts:
+                logging.info(f"All {len(contract_numbers)} contracts found early")
+                break
+
+    if not chunks:
+        return pd.DataFrame(columns=list(CREDIT_COLUMNS.values()), dtype=str)
+
+    credits_df = pd.concat(chunks, ignore_index=True)
+    return credits_df.rename(columns=CREDIT_COLUMNS).dropna(subset=["ID"])
+
+
+def read_zbrk_l_deashd4(file_path: Path) -> pd.DataFrame:
+    columns = {
+        "Клиент ": "client",
+        "Дата погашения по графику": "deadline_date",
+        "Валюта договора": "contract_currency",
+        "Номер договора": "contract_number",
+        "Проценты": "percentages",
+        "Отсроченные проценты": "deferred_interest",
+        "Основной долг": "debt",
+    }
+
+    data: dict[str, list[Any]] = {name: [] for name in columns.values()}
+    sheet_rows: list[int] = []
+    sections = 0
+
+    column_indices: dict[str, int] | None = None
+    for sheet_row, row in iter_sheet_rows(file_path):
+        if "Номер договора" in row:
+            sections += 1
+            missing_columns = [name for name in columns if name not in row]
+            if missing_columns:
+                raise ValueError(
+                    f"Columns {missing_columns} not found "
+                    f"in section {sections} of {file_path}"
+                )
+            column_indices = {columns[name]: row.index(name) for name in columns}
+            continue
+
+        if column_indices is None:
+            continue
+
+        contract_idx = column_indices["contract_number"]
+        if contract_idx < len(row) and row[contract_idx] == "Всего":
+            column_indices = None
+            continue
+
+        sheet_rows.append(sheet_row)
+        for name, idx in column_indices.items():
+            data[name].append(convert_cell(row[idx]) if idx < len(row) else np.nan)
+
+    if sections == 0:
+        raise ValueError(f'Header "Номер договора" not found in {file_path}')
+    logging.info(f"Parsed {sections} sections from {file_path.name}")
+
+    index = pd.Index(sheet_rows, name="sheet_row")
+    return apply_repayment_schema(pd.DataFrame(data, index=index, dtype=object))
+
+
+def parse_deadline_dates(dates: pd.Series) -> pd.Series:
+    is_text = dates.map(lambda value: isinstance(value, str))
+    parsed = pd.to_datetime(
+        dates.where(is_text).str.strip(), format=DEADLINE_FORMAT, errors="coerce"
     )
-    header_indices = zbrk_l_deashd4_dirty_df[
-        zbrk_l_deashd4_dirty_df[1] == "Номер договора"
-    ].index
+    timestamps = pd.to_datetime(dates.where(~is_text), errors="coerce")
+    return parsed.where(is_text, timestamps).dt.normalize()
 
-    start_index = header_indices[0]
-    if len(header_indices) > 1:
-        end_index = header_indices[1]
-    else:
-        end_index = len(zbrk_l_deashd4_dirty_df)
-
-    df = zbrk_l_deashd4_dirty_df.iloc[start_index:end_index]
-    df.columns = df.iloc[0]
-    df = df[1:].reset_index(drop=True)
-
-    df.rename(
-        columns={
-            "Клиент ": "client",
-            "Дата погашения по графику": "deadline_date",
-            "Валюта договора": "contract_currency",
-            "Номер договора": "contract_number",
-            "Проценты": "percentages",
-            "Отсроченные проценты": "deferred_interest",
-            "Основной долг": "debt",
-        },
-        inplace=True,
+
+def apply_repayment_schema(df: pd.DataFrame) -> pd.DataFrame:
+    unparsed_mask = df["deadline_date"].notna()
+    df = df.assign(
+        deadline_date=parse_deadline_dates(df["deadline_date"]),
+        **{col: df[col].astype("category") for col in CATEGORY_COLUMNS},
     )
 
-    trash_start_idx = df[df["contract_number"] == "Всего"].index.min()
-    df = df[0:trash_start_idx]
+    unparsed_count = (unparsed_mask & df["deadline_date"].isna()).sum()
+    if unparsed_count > 0:
+        logging.warning(f"{unparsed_count} deadline dates could not be parsed")
+
+    return df
+
+
+def frame_memory(df: pd.DataFrame) -> str:
+    return f"{df.memory_usage(deep=True).sum() / 2**20:.1f} MB"
+
+
+def parse_amounts(amounts: pd.Series) -> pd.Series:
+    inferred_dtype = pd.api.types.infer_dtype(amounts, skipna=True)
+    if inferred_dtype not in ("string", "mixed", "mixed-integer"):
+        return pd.to_numeric(amounts).astype(float)
+
+    text = amounts.str.replace(r"[\s']", "", regex=True).str.replace("\u2212", "-")
+    for separator in [",", "."]:
+        is_thousands = text.str.count(f"\\{separator}") > 1
+        text = text.where(~is_thousands, text.str.replace(separator, ""))
+    text = text.str.replace(r"[.,](?=.*[.,])", "", regex=True).str.replace(",", ".")
+
+    is_text = text.notna()
+    parsed = pd.to_numeric(text.where(text != ""), errors="coerce")
+
+    bad_mask = is_text & (text != "") & parsed.isna()
+    if bad_mask.any():
+        bad_cells = ", ".join(
+            f"sheet row {row}: {value!r}" for row, value in amounts[bad_mask].items()
+        )
+        raise ValueError(f"Unable to parse {amounts.name} amounts - {bad_cells}")
+
+    numbers = pd.to_numeric(amounts.where(~is_text), errors="coerce")
+    return parsed.where(is_text, numbers).astype(float)
+
 
-    df = df[df["deadline_date"] == end_date]
+def attach_start_dates(
+    df: pd.DataFrame, credits_df: pd.DataFrame, bot: TelegramAPI
+) -> pd.DataFrame:
+    needed_contracts = df["contract_number"].dropna().unique()
+    credits_df = credits_df[credits_df["contract_number"].isin(needed_contracts)]
 
-    for col in ["percentages", "deferred_interest", "debt"]:
-        df.loc[:, col] = df[col].apply(
-            lambda x: x if isinstance(x, float) else float(x.strip().replace(" ", ""))
+    duplicated_mask = credits_df["contract_number"].duplicated(keep="first")
+    duplicated_contracts = credits_df.loc[duplicated_mask, "contract_number"].unique()
+    if len(duplicated_contracts) > 0:
+        msg = (
+            f"{len(duplicated_contracts)} contract numbers are duplicated "
+            f"in credits. Using the first entry: {', '.join(duplicated_contracts)}"
+        )
+        logging.warning(msg)
+        bot.send_message(msg)
+
+    start_dates = credits_df[~duplicated_mask].set_index("contract_number")[
+        "start_date"
+    ]
+    df = df.assign(start_date=df["contract_number"].map(start_dates))
+
+    missing_contracts = df.loc[df["start_date"].isna(), "contract_number"].unique()
+    if len(missing_contracts) > 0:
+        msg = (
+            f"{len(missing_contracts)} contract numbers are missing "
+            f"in credits: {', '.join(missing_contracts)}"
         )
+        logging.error(msg)
+        bot.send_message(msg)
+
+    return df
+
+
+def to_tiyn(amounts: pd.Series) -> pd.Series:
+    return (amounts * 100).round().astype("Int64")
+
+
+def summarize_repayments(df: pd.DataFrame) -> pd.DataFrame:
+    keys = ["client", "deadline_date", "contract_currency"]
+    df = df.dropna(subset=keys)
+
+    df = df.assign(
+        client_code=df.groupby(keys[0], sort=False, observed=True).ngroup(),
+        letter_code=df.groupby(keys[:2], sort=False, observed=True).ngroup(),
+        currency_code=df.groupby(keys, sort=False, observed=True).ngroup(),
+    ).sort_values(["client_code", "letter_code", "currency_code"], kind="stable")
+
+    interest = df["percentages"].fillna(0) + df["deferred_interest"].fillna(0)
+    debt = df["debt"]
+    line_count = debt.notna().astype(int) + 1
+    currency_groups = line_count.groupby(df["currency_code"])
+
+    return df.assign(
+        interest=interest,
+        debt=debt,
+        idx=currency_groups.cumsum() - line_count + 1,
+        currency_total=(interest + debt.fillna(0))
+        .groupby(df["currency_code"])
+        .transform("sum"),
+        has_debt=debt.notna().groupby(df["letter_code"]).transform("any"),
+    )
 
-    for client in df.dropna(subset=["client"])["client"].unique():
-        last_currency = ""
 
-        deadline_dates = df[df["client"] == client]["deadline_date"].unique()
-        for deadline_date in deadline_dates:
-            client_name = client.replace('"', "")
+def collect_letters(
+    df: pd.DataFrame, docs_folder: Path, end_date: str, incomplete_clients: set[str]
+) -> list[Letter]:
+    df = summarize_repayments(df[~df["client"].isin(incomplete_clients)])
+    for client in incomplete_clients:
+        logging.error(f"{client} has contracts missing in credits. Skipping...")
+
+    columns = [
+        "letter_code",
+        "currency_code",
+        "client",
+        "deadline_date",
+        "has_debt",
+        "contract_currency",
+        "currency_total",
+        "idx",
+        "contract_number",
+        "start_date",
+        "interest",
+        "debt",
+    ]
+
+    letters: list[Letter] = []
+    doc_paths: set[Path] = set()
+    letter_code = currency_code = -1
+    letter = None
+    for row in df[columns].itertuples(index=False):
+        if row.letter_code != letter_code:
+            letter_code = row.letter_code
+            client_name = row.client.replace('"', "")
             file_name = f"{client_name}_{end_date}.docx"
-            doc_path = reports.docs_folder / file_name
-            if doc_path.exists():
-                logging.info(f"{file_name} exists. Skipping...")
+            doc_path = docs_folder / file_name
+            if doc_path in doc_paths:
+                logging.warning(f"{file_name} is already planned. Skipping...")
+                letter = None
                 continue
+            doc_paths.add(doc_path)
+
+            letter = Letter(
+                client=row.client,
+                deadline_date=row.deadline_date.strftime(DEADLINE_FORMAT),
+                has_debt=bool(row.has_debt),
+                currencies=[],
+                doc_path=doc_path,
+            )
+            letters.append(letter)
+        elif letter is None:
+            continue
+
+        if row.currency_code != currency_code:
+            currency_code = row.currency_code
+            currency_block = CurrencyBlock(
+                currency=row.contract_currency,
+                total=int(row.currency_total),
+                lines=[],
+            )
+            letter.currencies.append(currency_block)
+
+        currency_block.lines.append(
+            LetterLine(
+                idx=int(row.idx),
+                contract_number=row.contract_number,
+                start_date=row.start_date,
+                interest=int(row.interest),
+                debt=None if pd.isna(row.debt) else int(row.debt),
+            )
+        )
+
+    return letters
+
+
+def letter_digest(letter: Letter) -> str:
+    letter_input = repr(
+        (letter.client, letter.deadline_date, letter.has_debt, letter.currencies)
+    )
+    return hashlib.blake2b(letter_input.encode("utf-8")).hexdigest()[:32]
+
+
+def write_letter(
+    letter: Letter, template: DocxTemplate, letter_template: LetterTemplate
+) -> Path:
+    template.save(letter_template.render(letter), letter.doc_path)
+    return letter.doc_path
 
-            client_date_df: pd.DataFrame = df[
-                (df["client"] == client) & (df["deadline_date"] == deadline_date)
-            ]
 
-            text = (
-                f"\n\n\n\n\n\n{client}\n\n\n\nКасательно планового погашения по займу\n\n"
-                f"Настоящим АО «Банк Развития Казахстана» сообщает, что {deadline_date} года наступает срок "
-                f"погашения задолженности по следующим договорам банковского займа "
-                f"заключенным между Банком и {client}."
-                f"\nСумма к оплате:\n\n"
+worker_templates: tuple[DocxTemplate, LetterTemplate] | None = None
+
+
+def init_letter_worker(template: DocxTemplate, letter_template: LetterTemplate) -> None:
+    global worker_templates
+    worker_templates = (template, letter_template)
+
+
+def write_worker_letter(letter: Letter) -> Path:
+    return write_letter(letter, *worker_templates)
+
+
+LetterResults = dict[str, list[tuple[Path, Exception | None]]]
+
+
+def write_letters(
+    letters: list[Letter],
+    template: DocxTemplate,
+    letter_template: LetterTemplate,
+    workers: int = 1,
+) -> LetterResults:
+    errors: list[Exception | None] = [None] * len(letters)
+
+    if workers <= 1:
+        for idx, letter in enumerate(letters):
+            try:
+                write_letter(letter, template, letter_template)
+            except Exception as err:
+                errors[idx] = err
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_letter_worker,
+            initargs=(template, letter_template),
+        ) as executor:
+            futures = {
+                executor.submit(write_worker_letter, letter): idx
+                for idx, letter in enumerate(letters)
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as err:
+                    errors[futures[future]] = err
+
+    results: LetterResults = {}
+    for letter, err in zip(letters, errors):
+        results.setdefault(letter.client, []).append((letter.doc_path, err))
+    return results
+
+
+class LoadedReports(NamedTuple):
+    zbrk_l_deashd4: Future
+    credits: Future | None
+
+
+def submit_reports(
+    executor: ThreadPoolExecutor,
+    cache: ParseCache,
+    reports: Reports,
+    with_credits: bool = True,
+) -> LoadedReports:
+    zbrk_l_deashd4 = executor.submit(
+        cache.load, reports.zbrk_l_deashd4_xlsx_fpath, read_zbrk_l_deashd4
+    )
+    credits = None
+    if with_credits:
+        credits = executor.submit(
+            cache.load, reports.credit_contracts_fpath, read_credits
+        )
+    return LoadedReports(zbrk_l_deashd4=zbrk_l_deashd4, credits=credits)
+
+
+@metrics.timed("load_repayments")
+def load_repayments(
+    reports: Reports, end_dates: list[str], bot: TelegramAPI, semi_join: bool = False
+) -> pd.DataFrame:
+    cache = ParseCache(reports.report_root_folder / "cache")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        loaded = submit_reports(
+            executor=executor, cache=cache, reports=reports, with_credits=not semi_join
+        )
+        zbrk_l_deashd4_df = loaded.zbrk_l_deashd4.result()
+        logging.info(
+            f"{reports.zbrk_l_deashd4_xlsx_fpath.name}: {len(zbrk_l_deashd4_df)} rows, "
+            f"{frame_memory(zbrk_l_deashd4_df)}"
+        )
+        df = select_repayments(df=zbrk_l_deashd4_df, end_dates=end_dates)
+
+        if loaded.credits is None:
+            contract_numbers = set(df["contract_number"].dropna())
+            credits_df = read_needed_credits(
+                reports.credit_contracts_fpath, contract_numbers=contract_numbers
             )
+        else:
+            credits_df = loaded.credits.result()
+    logging.info(
+        f"{reports.credit_contracts_fpath.name}: {len(credits_df)} rows, "
+        f"{frame_memory(credits_df)}"
+    )
+    logging.info(f"Selected repayments: {len(df)} rows, {frame_memory(df)}")
+    logging.info(f"Parse cache: {cache.hits} hits, {cache.misses} misses")
+    metrics.count("repayment_rows", len(df))
+
+    return attach_start_dates(df=df, credits_df=credits_df, bot=bot)
+
+
+def to_deadline_date(end_date: str) -> pd.Timestamp:
+    return pd.Timestamp(datetime.strptime(end_date, DEADLINE_FORMAT))
 
-            currencies = client_date_df["contract_currency"].unique()
-            repayment_type1 = 0
-            repayment_type2 = 0
-
-            for currency in currencies:
-                currency_client_date_df = client_date_df[
-                    client_date_df["contract_currency"] == currency
-                ]
-
-                idx = 1
-                total_sum = 0
-
-                for row in currency_client_date_df.itertuples():
-                    contract_currency = row.contract_currency
-                    contract_number = row.contract_number
-                    percentages = row.percentages
-                    deferred_interest = row.deferred_interest
-                    debt = row.debt
-
-                    if contract_currency != last_currency:
-                        text += f"{contract_currency}\n"
-                        last_currency = contract_currency
-
-                    credit_row = credits_df[
-                        credits_df["contract_number"] == contract_number
-                    ].iloc[0]
-                    start_date = credit_row.start_date
-
-                    text += f"\t{idx}. Вознаграждение по {contract_number} от {start_date} года - "
-
-                    if np.isnan(row.deferred_interest):
-                        percentages_str = f"{percentages:,.2f}".replace(",", " ")
-                        text += f"{percentages_str} {currency}.\n"
-                    else:
-                        percentages += deferred_interest
-                        full_percentages_str = f"{percentages:,.2f}".replace(",", " ")
-                        text += f"{full_percentages_str} {currency}.\n"
-
-                    idx += 1
-                    repayment_type1 = 1
-
-                    if not np.isnan(debt):
-                        debt_str = f"{debt:,.2f}".replace(",", " ")
-                        text += (
-                            f"\t{idx}. Основной долг по {contract_number} от "
-                            f"{start_date} года - {debt_str} {currency}.\n"
-                        )
-
-                        idx += 1
-                        repayment_type2 = 1
-                        total_sum += debt
-
-                    total_sum += percentages
-
-                total_sum = f"{total_sum:,.2f}".replace(",", " ")
-                text += f"\nИтоговая сумма: {total_sum} {currency}.\n\n"
-
-            if (repayment_type1 + repayment_type2) == 1:
-                if repayment_type1 == 1:
-                    repayment_text = "вознаграждения"
-                else:
-                    repayment_text = "основного долга"
+
+def select_repayments(df: pd.DataFrame, end_dates: list[str]) -> pd.DataFrame:
+    df = df[df["deadline_date"].isin([to_deadline_date(d) for d in end_dates])]
+
+    return df.assign(
+        **{col: to_tiyn(parse_amounts(df[col])) for col in AMOUNT_COLUMNS},
+        **{col: df[col].cat.remove_unused_categories() for col in CATEGORY_COLUMNS},
+    )
+
+
+def create_documents(
+    df: pd.DataFrame,
+    docs_folder: Path,
+    end_date: str,
+    bot: TelegramAPI,
+    template: DocxTemplate,
+    letter_template: LetterTemplate,
+    workers: int = 1,
+) -> None:
+    df = df[df["deadline_date"] == to_deadline_date(end_date)]
+    incomplete_clients = set(df.loc[df["start_date"].isna(), "client"])
+
+    letters = collect_letters(
+        df=df,
+        docs_folder=docs_folder,
+        end_date=end_date,
+        incomplete_clients=incomplete_clients,
+    )
+
+    manifest = DocsManifest(
+        docs_folder / MANIFEST_FILE_NAME, f"{template.digest}:{letter_template.digest}"
+    )
+    digests = {letter.doc_path: letter_digest(letter) for letter in letters}
+    stale_letters = []
+    for letter in letters:
+        if manifest.is_fresh(letter.doc_path, digests[letter.doc_path]):
+            manifest.record(letter.doc_path, digests[letter.doc_path])
+        else:
+            stale_letters.append(letter)
+    reused_count = len(letters) - len(stale_letters)
+    logging.info(
+        f"Writing {len(stale_letters)} documents with {workers=}, "
+        f"{reused_count} are up to date"
+    )
+
+    with metrics.stage("write_letters"):
+        letter_results = write_letters(
+            letters=stale_letters,
+            template=template,
+            letter_template=letter_template,
+            workers=workers,
+        )
+
+    failed_clients = []
+    for client, client_results in letter_results.items():
+        for doc_path, err in client_results:
+            if err is None:
+                manifest.record(doc_path, digests[doc_path])
+                logging.info(f'"{doc_path.name}" saved...')
             else:
-                repayment_text = "вознаграждения и основного долга"
-
-            text += (
-                f"\nНа основании вышеизложенного просим Вас в срок "
-                f"до {deadline_date} обеспечить в полном объёме денежные средства на "
-                f"счете №KZ32907A287000000003, БИК DVKAKZKA в АО «Банк Развития Казахстана» "
-                f"для планового погашения {repayment_text} по займам.\n\n"
-                f"Надеемся на дальнейшее взаимовыгодное сотрудничество."
-            )
+                logging.error(f'Failed to save "{doc_path.name}": {err!r}')
+                failed_clients.append(client)
+
+    deleted_letters = manifest.remove_stale()
+    manifest.save()
+
+    metrics.count("letters_rendered", len(stale_letters) - len(failed_clients))
+    metrics.count("letters_reused", reused_count)
+    metrics.count("letters_failed", len(failed_clients))
+
+    if failed_clients:
+        msg = f"{len(failed_clients)} documents failed: {', '.join(failed_clients)}"
+        bot.send_message(msg)
 
-            doc = docx.Document()
-            doc.add_paragraph(text)
-            doc.save(str(doc_path))
-            logging.info(f'"{file_name}" saved...')
+    bot.send_message(
+        f"Documents for {end_date}: "
+        f"{len(stale_letters) - len(failed_clients)} rendered, "
+        f"{reused_count} reused, {len(deleted_letters)} deleted"
+    )
+
+
+@metrics.timed("process_docs")
+def run(
+    reports: Reports,
+    docs_folders: dict[str, Path],
+    bot: TelegramAPI,
+    workers: int = 1,
+    template_path: Path | None = None,
+    letter_template_path: Path = DEFAULT_LETTER_TEMPLATE_PATH,
+    semi_join: bool = False,
+) -> None:
+    df = load_repayments(
+        reports=reports, end_dates=list(docs_folders), bot=bot, semi_join=semi_join
+    )
+    template = DocxTemplate(template_path)
+    letter_template = LetterTemplate(letter_template_path)
+
+    for end_date, docs_folder in docs_folders.items():
+        docs_folder.mkdir(parents=True, exist_ok=True)
+        create_documents(
+            df=df,
+            docs_folder=docs_folder,
+            end_date=end_date,
+            bot=bot,
+            template=template,
+            letter_template=letter_template,
+            workers=workers,
+        )
 
     bot.send_message("Documents are created...")
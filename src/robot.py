@@ -10,9 +10,19 @@ from dotenv import set_key
 
 from src import process_docs
 from src.data import Date, TimeRange, Reports
-from src.notification import TelegramAPI, handle_error, Mail, send_mail
+from src.notification import (
+    MAX_ATTACHMENT_SIZE,
+    TelegramAPI,
+    handle_error,
+    load_client_emails,
+    Mail,
+    send_client_mails,
+    send_mail,
+)
 from src.utils.colvir import ColvirInfo, Colvir
 from src.utils.excel_utils import is_file_exported, convert_report, Excel
+from src.utils.letter_template import DEFAULT_LETTER_TEMPLATE_PATH
+from src.utils.metrics import finish_run, metrics
 
 
 def get_from_env(key: str) -> str:
@@ -90,19 +100,23 @@ def export_files(
             logging.info(msg)
             bot.send_message(msg)
 
-            for i in range(5):
-                credits_win.menu_select("#4->#4->#1")
-                colvir.save_excel(file_path=reports.credit_contracts_fpath)
-                if (error_win := colvir.app.window(title="Произошла ошибка")).exists():
-                    error_msg = error_win.child_window(class_name="Edit").window_text()
-                    logging.warning(f"{error_msg=}")
-                    error_win.close()
-                if not reports.credit_contracts_fpath.exists():
-                    continue
+            with metrics.stage("export_credits"):
+                for i in range(5):
+                    credits_win.menu_select("#4->#4->#1")
+                    colvir.save_excel(file_path=reports.credit_contracts_fpath)
+                    error_win = colvir.app.window(title="Произошла ошибка")
+                    if error_win.exists():
+                        error_msg = error_win.child_window(
+                            class_name="Edit"
+                        ).window_text()
+                        logging.warning(f"{error_msg=}")
+                        error_win.close()
+                    if not reports.credit_contracts_fpath.exists():
+                        continue
+                    else:
+                        break
                 else:
-                    break
-            else:
-                raise Exception("Unable to export credit_contracts")
+                    raise Exception("Unable to export credit_contracts")
 
         if not zbrk_l_deashd4_xlsx_exists:
             if zbrk_l_deashd4_exists:
@@ -121,59 +135,65 @@ def export_files(
                 logging.info(msg)
                 bot.send_message(msg)
 
-                try:
-                    credits_win.wait(wait_for="exists enabled", timeout=20)
-                except pywinauto.timings.TimeoutError:
-                    colvir.reload()
-                    colvir.choose_mode("SLOAN")
-
-                    filter_win = colvir.utils.get_window(title="Фильтр")
-                    filter_win["OK"].click()
-                    credits_win = colvir.utils.get_window(title="Кредитные договора")
-
-                if not credits_win.has_focus():
-                    credits_win.set_focus()
-
-                colvir.find_and_click_button(
-                    window=credits_win,
-                    toolbar=credits_win["Static0"],
-                    target_button_name="Получить отчет(F5)",
-                )
-
-                report_win = colvir.utils.get_window(title="Выбор отчета")
-                colvir.utils.click_input(report_win["Предварительный просмотр"])
-                colvir.utils.click_input(report_win["Экспорт в файл..."])
-                file_win = colvir.utils.get_window(title="Файл отчета ")
-
-                colvir.utils.type_keys(
-                    file_win["Edit2"],
-                    str(reports.report_root_folder),
-                    step_delay=0.3,
-                    delay_after=1,
-                )
-                colvir.utils.type_keys(
-                    file_win["Edit4"], reports.zbrk_l_deashd4_fpath.name, step_delay=0.3
-                )
-                try:
-                    file_win["ComboBox"].select(12)
-                    sleep(1)
-                except (IndexError, ValueError):
-                    pass
-                file_win["OK"].click()
-
-                params_win = colvir.utils.get_window(title="Параметры отчета ")
-                params_win["Edit2"].set_text(t_range.start.short)
-                params_win["Edit4"].set_text(t_range.end.short)
-                params_win["OK"].click()
+                with metrics.stage("export_zbrk_l_deashd4"):
+                    try:
+                        credits_win.wait(wait_for="exists enabled", timeout=20)
+                    except pywinauto.timings.TimeoutError:
+                        colvir.reload()
+                        colvir.choose_mode("SLOAN")
+
+                        filter_win = colvir.utils.get_window(title="Фильтр")
+                        filter_win["OK"].click()
+                        credits_win = colvir.utils.get_window(
+                            title="Кредитные договора"
+                        )
+
+                    if not credits_win.has_focus():
+                        credits_win.set_focus()
+
+                    colvir.find_and_click_button(
+                        window=credits_win,
+                        toolbar=credits_win["Static0"],
+                        target_button_name="Получить отчет(F5)",
+                    )
+
+                    report_win = colvir.utils.get_window(title="Выбор отчета")
+                    colvir.utils.click_input(report_win["Предварительный просмотр"])
+                    colvir.utils.click_input(report_win["Экспорт в файл..."])
+                    file_win = colvir.utils.get_window(title="Файл отчета ")
+
+                    colvir.utils.type_keys(
+                        file_win["Edit2"],
+                        str(reports.report_root_folder),
+                        step_delay=0.3,
+                        delay_after=1,
+                    )
+                    colvir.utils.type_keys(
+                        file_win["Edit4"],
+                        reports.zbrk_l_deashd4_fpath.name,
+                        step_delay=0.3,
+                    )
+                    try:
+                        file_win["ComboBox"].select(12)
+                        sleep(1)
+                    except (IndexError, ValueError):
+                        pass
+                    file_win["OK"].click()
+
+                    params_win = colvir.utils.get_window(title="Параметры отчета ")
+                    params_win["Edit2"].set_text(t_range.start.short)
+                    params_win["Edit4"].set_text(t_range.end.short)
+                    params_win["OK"].click()
 
                 with Excel() as excel:
-                    status = False
-                    while not status:
-                        sleep(5)
-                        message, status = is_file_exported(
-                            file_path=reports.zbrk_l_deashd4_fpath, excel=excel
-                        )
-                        logging.info(message)
+                    with metrics.stage("excel_export_wait"):
+                        status = False
+                        while not status:
+                            sleep(5)
+                            message, status = is_file_exported(
+                                file_path=reports.zbrk_l_deashd4_fpath, excel=excel
+                            )
+                            logging.info(message)
 
                     if not reports.zbrk_l_deashd4_xlsx_fpath.exists():
                         logging.info(
@@ -186,18 +206,39 @@ def export_files(
                         )
 
 
-@handle_error
-def run(bot: TelegramAPI, project_folder: Path, env_path: Path) -> None:
-    today_dt = datetime.now()
-    # today_dt = datetime(2024, 12, 20)
-    current_year_month_name = today_dt.strftime("%Y_%m/%d.%m.%y")
+def parse_run_dates(values: list[str]) -> list[datetime]:
+    run_dates: set[datetime] = set()
+    for value in values:
+        start, _, end = value.partition("-")
+        start_dt = datetime.strptime(start, "%d.%m.%y")
+        end_dt = datetime.strptime(end, "%d.%m.%y") if end else start_dt
+        if end_dt < start_dt:
+            raise ValueError(f"Invalid date range {value}")
+        for days in range((end_dt - start_dt).days + 1):
+            run_dates.add(start_dt + timedelta(days=days))
+    return sorted(run_dates)
 
-    t_range = TimeRange(
-        start=Date.to_date(today_dt), end=Date.to_date(today_dt + timedelta(days=16))
-    )
+
+def process_run_dates(
+    bot: TelegramAPI,
+    project_folder: Path,
+    env_path: Path,
+    run_dates: list[datetime],
+) -> None:
+    first_dt, last_dt = run_dates[0], run_dates[-1]
+
+    date_ranges = [
+        TimeRange(start=Date.to_date(dt), end=Date.to_date(dt + timedelta(days=16)))
+        for dt in run_dates
+    ]
+    t_range = TimeRange(start=date_ranges[0].start, end=date_ranges[-1].end)
 
     logging.info(f"{t_range=}")
 
+    current_year_month_name = first_dt.strftime("%Y_%m/%d.%m.%y")
+    if len(run_dates) > 1:
+        current_year_month_name += last_dt.strftime("-%d.%m.%y")
+
     backup_folder = project_folder / "backups"
     backup_folder.mkdir(exist_ok=True)
     logging.info(f"{backup_folder=}")
@@ -210,8 +251,14 @@ def run(bot: TelegramAPI, project_folder: Path, env_path: Path) -> None:
     docs_folder.mkdir(exist_ok=True)
     logging.info(f"{docs_folder=}")
 
+    if len(run_dates) > 1:
+        docs_folders = {r.end.short: docs_folder / r.end.short for r in date_ranges}
+    else:
+        docs_folders = {t_range.end.short: docs_folder}
+
+    run_dates_str = ", ".join(r.start.short for r in date_ranges)
     bot.send_message(
-        f"Старт процесса за {t_range.start.short}\n" f'"Уведомления по план плате"'
+        f"Старт процесса за {run_dates_str}\n" f'"Уведомления по план плате"'
     )
 
     credit_contracts_fpath = report_root_folder / f"credits_{t_range.start.short}.xls"
@@ -228,25 +275,101 @@ def run(bot: TelegramAPI, project_folder: Path, env_path: Path) -> None:
         zbrk_l_deashd4_xlsx_fpath=zbrk_l_deashd4_xlsx_fpath,
     )
 
-    export_files(
+    template_path = None
+    if template_env := os.getenv("LETTER_TEMPLATE_PATH"):
+        template_path = Path(template_env)
+    logging.info(f"{template_path=}")
+
+    letter_template_path = DEFAULT_LETTER_TEMPLATE_PATH
+    if letter_template_env := os.getenv("LETTER_TEXT_TEMPLATE_PATH"):
+        letter_template_path = Path(letter_template_env)
+    logging.info(f"{letter_template_path=}")
+
+    with metrics.stage("export_files"):
+        export_files(
+            reports=reports,
+            t_range=t_range,
+            bot=bot,
+            backup_folder=backup_folder,
+            env_path=env_path,
+        )
+
+    process_docs.run(
         reports=reports,
-        t_range=t_range,
+        docs_folders=docs_folders,
         bot=bot,
-        backup_folder=backup_folder,
-        env_path=env_path,
+        workers=int(os.getenv("DOCS_WORKERS", "1")),
+        template_path=template_path,
+        letter_template_path=letter_template_path,
+        semi_join=os.getenv("CREDITS_SEMI_JOIN") == "1",
     )
 
-    process_docs.run(reports=reports, end_date=t_range.end.short, bot=bot)
+    client_emails = None
+    if client_emails_env := os.getenv("CLIENT_EMAILS_PATH"):
+        client_emails = load_client_emails(Path(client_emails_env))
+        logging.info(f"Loaded email addresses of {len(client_emails)} clients")
+
+    for date_range in date_ranges:
+        mail_info = Mail(
+            server=os.getenv("SMTP_SERVER"),
+            sender=os.getenv("SMTP_SENDER"),
+            recipients=os.getenv("SMTP_RECIPIENTS"),
+            subject="Отчет робота по плановым платежам",
+            attachment_folder_path=docs_folders[date_range.end.short],
+            max_attachment_size=int(
+                os.getenv("SMTP_MAX_ATTACHMENT_SIZE", MAX_ATTACHMENT_SIZE)
+            ),
+        )
 
-    mail_info = Mail(
-        server=os.getenv("SMTP_SERVER"),
-        sender=os.getenv("SMTP_SENDER"),
-        recipients=os.getenv("SMTP_RECIPIENTS"),
-        subject="Отчет робота по плановым платежам",
-        attachment_folder_path=reports.docs_folder,
-    )
+        send_mail(mail_info=mail_info, t_range=date_range, bot=bot)
+
+        if client_emails is not None:
+            send_client_mails(
+                mail_info=mail_info._replace(
+                    subject="Уведомление о плановом погашении"
+                ),
+                t_range=date_range,
+                bot=bot,
+                client_emails=client_emails,
+                connections=int(os.getenv("SMTP_CONNECTIONS", "1")),
+            )
 
-    send_mail(mail_info=mail_info, t_range=t_range, bot=bot)
+
+@handle_error
+def run(
+    bot: TelegramAPI,
+    project_folder: Path,
+    env_path: Path,
+    run_dates: list[datetime] | None = None,
+) -> None:
+    metrics.reset()
+
+    if not run_dates:
+        run_dates = [datetime.now()]
+        # run_dates = [datetime(2024, 12, 20)]
+    run_dates = sorted(run_dates)
+    log_folder = project_folder / "logs"
+    run_dates_short = [Date.to_date(dt).short for dt in run_dates]
+
+    try:
+        process_run_dates(
+            bot=bot,
+            project_folder=project_folder,
+            env_path=env_path,
+            run_dates=run_dates,
+        )
+    except BaseException:
+        try:
+            finish_run(log_folder=log_folder, run_dates=run_dates_short, failed=True)
+        except Exception as err:
+            logging.warning(f"Unable to record metrics of the failed run: {err!r}")
+        raise
+
+    _, summary = finish_run(
+        log_folder=log_folder, run_dates=run_dates_short, failed=False
+    )
+    bot.send_message(summary)
 
     bot.send_message("Успешное окончание процесса")
+    bot.flush()
     logging.info("Successfully finished...")
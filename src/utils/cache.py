@@ -0,0 +1,60 @@
+import hashlib
+import logging
+import pickle
+import threading
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+CACHE_VERSION = 3
+
+
+def file_digest(file_path: Path) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()[:32]
+
+
+class ParseCache:
+    def __init__(self, cache_folder: Path) -> None:
+        self.cache_folder = cache_folder
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def cache_path(self, source: Path) -> Path:
+        stat = source.stat()
+        return self.cache_folder / (
+            f"{source.name}_{stat.st_size}_{stat.st_mtime_ns}_"
+            f"{file_digest(source)}_v{CACHE_VERSION}.pkl"
+        )
+
+    def load(self, source: Path, parse: Callable[[Path], pd.DataFrame]) -> pd.DataFrame:
+        cache_path = self.cache_path(source)
+
+        if cache_path.exists():
+            try:
+                with open(cache_path, "rb") as f:
+                    df = pickle.load(f)
+                with self.lock:
+                    self.hits += 1
+                logging.info(f"Cache hit for {source.name}: {cache_path.name}")
+                return df
+            except (OSError, pickle.UnpicklingError, EOFError) as err:
+                logging.warning(f"Unable to read {cache_path.name}: {err!r}")
+
+        with self.lock:
+            self.misses += 1
+        logging.info(f"Cache miss for {source.name}. Parsing...")
+        df = parse(source)
+
+        for stale_path in self.cache_folder.glob(f"{source.name}_*.pkl"):
+            stale_path.unlink(missing_ok=True)
+
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(df, f, protocol=5)
+        tmp_path.replace(cache_path)
+
+        return df
@@ -22,6 +22,7 @@ from attr import define
 from pywinauto import mouse, win32functions
 
 from src.notification import TelegramAPI
+from src.utils.metrics import metrics
 
 pyautogui.FAILSAFE = False
 
@@ -224,6 +225,7 @@ class Colvir:
         self.bot = bot
         self.was_password_changed = False
 
+    @metrics.timed("colvir_open")
     def open_colvir(self) -> None:
         original_dir = os.getcwd()
         apploader_dir = self.info.loader.parent
@@ -467,6 +469,13 @@ class Colvir:
         if not self.app.kill():
             kill_all_processes("COLVIR")
 
+    def window_bbox(self) -> tuple[int, int, int, int] | None:
+        try:
+            rectangle = self.app.top_window().rectangle()
+        except (Exception, BaseException):
+            return None
+        return rectangle.left, rectangle.top, rectangle.right, rectangle.bottom
+
     def __enter__(self) -> "Colvir":
         self.open_colvir()
         return self
@@ -478,5 +487,5 @@ class Colvir:
         exc_tb: TracebackType | None,
     ):
         if exc_val is not None or exc_type is not None or exc_tb is not None:
-            self.bot.send_image()
+            self.bot.send_image(bbox=self.window_bbox())
         self.exit()
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import re
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import docx
+
+LETTER_MARKER = "{{letter}}"
+
+
+def zip_info(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(filename=name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 0
+    return info
+
+
+def text_to_run_xml(text: str) -> str:
+    run_xml = []
+    for chunk in re.split(r"([\t\r\n])", text):
+        if chunk == "\t":
+            run_xml.append("<w:tab/>")
+        elif chunk in ("\r", "\n"):
+            run_xml.append("<w:br/>")
+        elif chunk:
+            if len(chunk.strip()) < len(chunk):
+                run_xml.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+            else:
+                run_xml.append(f"<w:t>{escape(chunk)}</w:t>")
+    return "".join(run_xml)
+
+
+class DocxTemplate:
+    def __init__(self, template_path: Path | None = None) -> None:
+        document = docx.Document(str(template_path) if template_path else None)
+        if not any(p.text == LETTER_MARKER for p in document.paragraphs):
+            document.add_paragraph(LETTER_MARKER)
+
+        package = io.BytesIO()
+        document.save(package)
+
+        document_xml = ""
+        static_package = io.BytesIO()
+        with (
+            zipfile.ZipFile(package) as source,
+            zipfile.ZipFile(static_package, "w") as target,
+        ):
+            for info in source.infolist():
+                if info.filename == "word/document.xml":
+                    document_xml = source.read(info).decode("utf-8")
+                else:
+                    target.writestr(zip_info(info.filename), source.read(info))
+
+        head, marker, tail = document_xml.partition(f"<w:t>{LETTER_MARKER}</w:t>")
+        if not marker:
+            raise ValueError(
+                f"{template_path} must contain {LETTER_MARKER} in a single text run"
+            )
+
+        self.document_head = head.encode("utf-8")
+        self.document_tail = tail.encode("utf-8")
+        self.static_package = static_package.getvalue()
+        self.digest = hashlib.blake2b(
+            self.static_package + self.document_head + self.document_tail
+        ).hexdigest()[:32]
+
+    def render(self, text: str) -> bytes:
+        package = io.BytesIO(self.static_package)
+        with zipfile.ZipFile(package, "a") as archive:
+            archive.writestr(
+                zip_info("word/document.xml"),
+                self.document_head
+                + text_to_run_xml(text).encode("utf-8")
+                + self.document_tail,
+            )
+        return package.getvalue()
+
+    def save(self, text: str, file_path: Path) -> None:
+        file_path.write_bytes(self.render(text))
@@ -6,6 +6,8 @@ import openpyxl
 import psutil
 import win32com.client as win32
 
+from src.utils.metrics import metrics
+
 
 def kill_all_processes(proc_name: str) -> None:
     for proc in psutil.process_iter():
@@ -93,6 +95,7 @@ def is_file_exported(file_path: Path, excel: Excel) -> tuple[str, bool]:
     return message, True
 
 
+@metrics.timed("excel_convert")
 def convert_report(excel: Excel, source: Path, dist: Path) -> None:
     dist.parent.mkdir(exist_ok=True)
     with Workbook(excel=excel, file_path=source) as workbook:
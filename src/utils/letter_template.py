@@ -0,0 +1,103 @@
+import hashlib
+import string
+import tomllib
+from pathlib import Path
+
+from src.data import Letter
+
+DEFAULT_LETTER_TEMPLATE_PATH = (
+    Path(__file__).parent.parent / "templates" / "letter.toml"
+)
+
+SECTION_FIELDS = {
+    "header": {"client", "deadline_date"},
+    "currency": {"currency"},
+    "interest": {"idx", "contract_number", "start_date", "amount", "currency"},
+    "debt": {"idx", "contract_number", "start_date", "amount", "currency"},
+    "total": {"total", "currency"},
+    "footer": {"client", "deadline_date", "repayment_text"},
+    "repayment_interest": set(),
+    "repayment_interest_and_debt": set(),
+}
+
+
+def format_amount(tiyn: int) -> str:
+    sign = "-" if tiyn < 0 else ""
+    units, cents = divmod(abs(tiyn), 100)
+    return f"{sign}{units:,}.{cents:02d}".replace(",", " ")
+
+
+class LetterTemplate:
+    def __init__(self, template_path: Path = DEFAULT_LETTER_TEMPLATE_PATH) -> None:
+        template_bytes = template_path.read_bytes()
+        self.digest = hashlib.blake2b(template_bytes).hexdigest()[:32]
+
+        sections = tomllib.loads(template_bytes.decode("utf-8"))
+        formatter = string.Formatter()
+        for name, fields in SECTION_FIELDS.items():
+            if not isinstance(sections.get(name), str):
+                raise ValueError(f'Section "{name}" is missing in {template_path}')
+            used_fields = {
+                field for _, field, _, _ in formatter.parse(sections[name]) if field
+            }
+            if unknown_fields := used_fields - fields:
+                raise ValueError(
+                    f'Unknown fields {sorted(unknown_fields)} in section "{name}" '
+                    f"of {template_path}"
+                )
+
+        self.header = sections["header"]
+        self.currency = sections["currency"]
+        self.interest = sections["interest"]
+        self.debt = sections["debt"]
+        self.total = sections["total"]
+        self.footer = sections["footer"]
+        self.repayment_interest = sections["repayment_interest"]
+        self.repayment_interest_and_debt = sections["repayment_interest_and_debt"]
+
+    def render(self, letter: Letter) -> str:
+        parts = [
+            self.header.format(client=letter.client, deadline_date=letter.deadline_date)
+        ]
+
+        for currency, total, lines in letter.currencies:
+            parts.append(self.currency.format(currency=currency))
+
+            for line in lines:
+                parts.append(
+                    self.interest.format(
+                        idx=line.idx,
+                        contract_number=line.contract_number,
+                        start_date=line.start_date,
+                        amount=format_amount(line.interest),
+                        currency=currency,
+                    )
+                )
+                if line.debt is not None:
+                    parts.append(
+                        self.debt.format(
+                            idx=line.idx + 1,
+                            contract_number=line.contract_number,
+                            start_date=line.start_date,
+                            amount=format_amount(line.debt),
+                            currency=currency,
+                        )
+                    )
+
+            parts.append(
+                self.total.format(total=format_amount(total), currency=currency)
+            )
+
+        if letter.has_debt:
+            repayment_text = self.repayment_interest_and_debt
+        else:
+            repayment_text = self.repayment_interest
+        parts.append(
+            self.footer.format(
+                client=letter.client,
+                deadline_date=letter.deadline_date,
+                repayment_text=repayment_text,
+            )
+        )
+
+        return "".join(parts)
@@ -1,26 +1,79 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 import pytz
 from rich.logging import RichHandler
 
+ALMATY_TZ = pytz.timezone("Asia/Almaty")
 
-def setup_logger(project_root: Path) -> Path:
-    today = datetime.now(pytz.timezone("Asia/Almaty"))
+listener: QueueListener | None = None
 
-    logging.Formatter.converter = lambda *args: today.timetuple()
+
+class AlmatyFormatter(logging.Formatter):
+    def converter(self, timestamp: float) -> tuple:
+        return datetime.fromtimestamp(timestamp, ALMATY_TZ).timetuple()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, ALMATY_TZ).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "name": record.name,
+            "file": record.filename,
+            "func": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LocalQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def stop_logger() -> None:
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def setup_logger(project_root: Path, json_logs: bool | None = None) -> Path:
+    global listener
+    stop_logger()
+
+    today = datetime.now(ALMATY_TZ)
 
     log_folder = project_root / "logs"
     log_folder.mkdir(exist_ok=True)
 
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
+    for handler in logger.handlers[:]:
+        if isinstance(handler, LocalQueueHandler):
+            logger.removeHandler(handler)
 
     log_format = (
         "%(asctime).19s %(levelname)s %(name)s %(filename)s %(funcName)s : %(message)s"
     )
-    formatter = logging.Formatter(log_format)
+    formatter = AlmatyFormatter(log_format)
 
     today_str = today.strftime("%d.%m.%y")
     year_month_folder = log_folder / today.strftime("%Y/%B")
@@ -36,13 +89,27 @@ def setup_logger(project_root: Path) -> Path:
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
-    logger.addHandler(file_handler)
-
-    logger.addHandler(
+    handlers: list[logging.Handler] = [
+        file_handler,
         RichHandler(
             omit_repeated_times=False,
             rich_tracebacks=True,
+        ),
+    ]
+
+    if json_logs is None:
+        json_logs = os.getenv("LOG_JSON") == "1"
+    if json_logs:
+        json_handler = logging.FileHandler(
+            year_month_folder / f"{today_str}.jsonl", encoding="utf-8"
         )
-    )
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    logger.addHandler(LocalQueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logger)
 
     return logger_file
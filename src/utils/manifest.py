@@ -0,0 +1,52 @@
+import json
+import logging
+from pathlib import Path
+
+
+MANIFEST_FILE_NAME = ".manifest.json"
+
+
+def read_manifest(manifest_path: Path) -> dict:
+    manifest = {"template": None, "letters": {}}
+    if manifest_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as err:
+            logging.warning(f"Unable to read {manifest_path.name}: {err!r}")
+    return manifest
+
+
+class DocsManifest:
+    def __init__(self, manifest_path: Path, template_digest: str) -> None:
+        self.manifest_path = manifest_path
+        self.template_digest = template_digest
+
+        previous = read_manifest(manifest_path)
+        self.previous_letters: dict[str, str] = previous.get("letters", {})
+        self.is_same_template = previous.get("template") == template_digest
+        self.letters: dict[str, str] = {}
+
+    def is_fresh(self, doc_path: Path, digest: str) -> bool:
+        return (
+            self.is_same_template
+            and self.previous_letters.get(doc_path.name) == digest
+            and doc_path.exists()
+        )
+
+    def record(self, doc_path: Path, digest: str) -> None:
+        self.letters[doc_path.name] = digest
+
+    def remove_stale(self) -> list[str]:
+        stale_names = [
+            name for name in self.previous_letters if name not in self.letters
+        ]
+        for name in stale_names:
+            (self.manifest_path.parent / name).unlink(missing_ok=True)
+            logging.info(f'"{name}" is stale. Deleted...')
+        return stale_names
+
+    def save(self) -> None:
+        manifest = {"template": self.template_digest, "letters": self.letters}
+        self.manifest_path.write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterator
+
+HISTORY_FILE_NAME = "metrics.jsonl"
+HISTORY_WINDOW = 30
+MIN_HISTORY_RUNS = 5
+MIN_SLOW_SECONDS = 1.0
+
+
+class RunMetrics:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = datetime.now()
+        self.start = perf_counter()
+        self.stages: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            logging.info(f"Stage {name} took {elapsed:.2f}s")
+
+    def timed(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            @wraps(func)
+            def wrapper(*args, **kwargs) -> Any:
+                with self.stage(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "stages": {
+                "total": perf_counter() - self.start,
+                **self.stages,
+            },
+            "counts": self.counts,
+        }
+
+
+def p90(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * 9 // 10) - 1)]
+
+
+def read_history(history_path: Path) -> list[dict[str, Any]]:
+    if not history_path.exists():
+        return []
+
+    runs = []
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                logging.warning(f"Skipping broken line in {history_path.name}")
+    return runs[-HISTORY_WINDOW:]
+
+
+def slow_stages(
+    stages: dict[str, float], history: list[dict[str, Any]]
+) -> dict[str, float]:
+    slow = {}
+    for name, seconds in stages.items():
+        if seconds < MIN_SLOW_SECONDS:
+            continue
+        previous = [run["stages"][name] for run in history if name in run["stages"]]
+        if len(previous) >= MIN_HISTORY_RUNS and seconds > (limit := p90(previous)):
+            slow[name] = limit
+    return slow
+
+
+def write_prometheus(textfile_path: Path, run: dict[str, Any]) -> None:
+    lines = [
+        "# HELP pay_notifications_stage_seconds Duration of the last run stages.",
+        "# TYPE pay_notifications_stage_seconds gauge",
+    ]
+    for name, seconds in run["stages"].items():
+        lines.append(f'pay_notifications_stage_seconds{{stage="{name}"}} {seconds:.3f}')
+    lines += [
+        "# HELP pay_notifications_count Row and document counts of the last run.",
+        "# TYPE pay_notifications_count gauge",
+    ]
+    for name, value in run["counts"].items():
+        lines.append(f'pay_notifications_count{{name="{name}"}} {value}')
+    finished_at = datetime.now().timestamp()
+    lines += [
+        "# HELP pay_notifications_last_run_timestamp_seconds Last run finish time.",
+        "# TYPE pay_notifications_last_run_timestamp_seconds gauge",
+        f"pay_notifications_last_run_timestamp_seconds {finished_at:.0f}",
+    ]
+
+    tmp_path = textfile_path.with_suffix(".tmp")
+    tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    tmp_path.replace(textfile_path)
+
+
+def format_summary(run: dict[str, Any], slow: dict[str, float]) -> str:
+    lines = ["Stage timings:"]
+    for name, seconds in run["stages"].items():
+        line = f"{name}: {seconds:.1f}s"
+        if name in slow:
+            line += f" - slower than p90 {slow[name]:.1f}s"
+        lines.append(line)
+    lines += [f"{name}: {value}" for name, value in run["counts"].items()]
+    return "\n".join(lines)
+
+
+def finish_run(log_folder: Path, **fields: Any) -> tuple[dict[str, Any], str]:
+    run = {**fields, **metrics.snapshot()}
+
+    log_folder.mkdir(parents=True, exist_ok=True)
+    history_path = log_folder / HISTORY_FILE_NAME
+    history = [run for run in read_history(history_path) if not run.get("failed")]
+    slow = slow_stages(run["stages"], history)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+    if textfile_path := os.getenv("METRICS_TEXTFILE_PATH"):
+        write_prometheus(Path(textfile_path), run)
+
+    if slow:
+        logging.warning(f"Stages slower than p90: {slow}")
+    return run, format_summary(run, slow)
+
+
+metrics = RunMetrics()
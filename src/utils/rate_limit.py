@@ -0,0 +1,30 @@
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        waited = 0.0
+        with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                time.sleep(delay)
+                waited += delay
+                self.refill()
+            self.tokens -= 1
+        return waited
@@ -0,0 +1,55 @@
+import io
+import os
+from typing import NamedTuple
+
+import PIL.Image as Image
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+class ScreenshotSettings(NamedTuple):
+    format: str = "JPEG"
+    quality: int = 70
+    max_dimension: int | None = 1920
+    crop_to_window: bool = False
+
+
+def screenshot_settings_from_env() -> ScreenshotSettings:
+    image_format = os.getenv("SCREENSHOT_FORMAT", "JPEG").upper()
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Unsupported screenshot format {image_format}")
+    max_dimension = int(os.getenv("SCREENSHOT_MAX_DIMENSION", "1920"))
+    return ScreenshotSettings(
+        format=image_format,
+        quality=int(os.getenv("SCREENSHOT_QUALITY", "70")),
+        max_dimension=max_dimension or None,
+        crop_to_window=os.getenv("SCREENSHOT_CROP_TO_WINDOW") == "1",
+    )
+
+
+def downscale(media: Image.Image, max_dimension: int) -> Image.Image:
+    if max(media.size) <= max_dimension:
+        return media
+    factor = max(media.size) // max_dimension
+    media = media.reduce(factor) if factor >= 2 else media.copy()
+    media.thumbnail((max_dimension, max_dimension), Image.Resampling.BILINEAR)
+    return media
+
+
+def encode_screenshot(
+    media: Image.Image, settings: ScreenshotSettings
+) -> tuple[str, io.BytesIO, str]:
+    if settings.max_dimension:
+        media = downscale(media, settings.max_dimension)
+    if settings.format == "JPEG" and media.mode != "RGB":
+        media = media.convert("RGB")
+
+    image_stream = io.BytesIO()
+    if settings.format == "PNG":
+        media.save(image_stream, format="PNG", compress_level=1)
+    else:
+        media.save(image_stream, format=settings.format, quality=settings.quality)
+
+    image_stream.seek(0)
+    file_name = f"screenshot.{settings.format.lower()}"
+    return file_name, image_stream, MIME_TYPES[settings.format]
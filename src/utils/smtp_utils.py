@@ -0,0 +1,195 @@
+import base64
+import email.policy
+import itertools
+import logging
+import queue
+import re
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from typing import IO, Callable, Iterator, NamedTuple
+
+BASE64_LINE_BYTES = 57
+BASE64_LINE_SIZE = 76 + 2
+ENCODE_CHUNK_SIZE = BASE64_LINE_BYTES * 1024
+MESSAGE_OVERHEAD = 64 * 1024
+SEND_BUFFER_SIZE = 256 * 1024
+SMTP_POLICY = email.policy.compat32.clone(linesep="\r\n")
+
+SendErrors = dict[str, tuple[int, bytes]]
+
+
+def quote_periods(data: bytes) -> bytes:
+    return re.sub(rb"(?m)^\.", b"..", data)
+
+
+def attachment_size_limit(message_size: int) -> int:
+    lines = (message_size - MESSAGE_OVERHEAD) // BASE64_LINE_SIZE
+    return max(0, lines) * BASE64_LINE_BYTES
+
+
+def server_size_limit(smtp: smtplib.SMTP) -> int | None:
+    smtp.ehlo_or_helo_if_needed()
+    size = smtp.esmtp_features.get("size", "")
+    if size.isdigit() and int(size) > 0:
+        return int(size)
+    return None
+
+
+def iter_base64(source: IO[bytes]) -> Iterator[bytes]:
+    while chunk := source.read(ENCODE_CHUNK_SIZE):
+        yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+
+def iter_message(
+    msg: MIMEMultipart, attachment: IO[bytes] | None, attachment_name: str = ""
+) -> Iterator[bytes]:
+    if attachment is None:
+        return iter([quote_periods(msg.as_bytes(policy=SMTP_POLICY))])
+
+    marker = f"attachment-{uuid.uuid4().hex}"
+    part = MIMEBase("application", "octet-stream")
+    part["Content-Transfer-Encoding"] = "base64"
+    filename = attachment_name
+    if not attachment_name.isascii():
+        filename = ("utf-8", "", attachment_name)
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    part.set_payload(marker)
+    msg.attach(part)
+
+    head, _, tail = msg.as_bytes(policy=SMTP_POLICY).partition(marker.encode())
+    return itertools.chain(
+        [quote_periods(head)], iter_base64(attachment), [quote_periods(tail)]
+    )
+
+
+def send_stream(
+    smtp: smtplib.SMTP, sender: str, recipients: list[str], chunks: Iterator[bytes]
+) -> SendErrors:
+    smtp.ehlo_or_helo_if_needed()
+
+    code, resp = smtp.mail(sender)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, sender)
+
+    errors: SendErrors = {}
+    for recipient in recipients:
+        code, resp = smtp.rcpt(recipient)
+        if code not in (250, 251):
+            errors[recipient] = (code, resp)
+    if len(errors) == len(recipients):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(errors)
+
+    smtp.putcmd("data")
+    code, resp = smtp.getreply()
+    if code != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, resp)
+
+    buffer = bytearray()
+    ends_with_crlf = False
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            ends_with_crlf = chunk.endswith(b"\r\n")
+            if len(buffer) >= SEND_BUFFER_SIZE:
+                smtp.send(bytes(buffer))
+                buffer.clear()
+    except BaseException:
+        smtp.close()
+        raise
+    buffer += b".\r\n" if ends_with_crlf else b"\r\n.\r\n"
+    smtp.send(bytes(buffer))
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return errors
+
+
+class MailJob(NamedTuple):
+    sender: str
+    recipients: list[str]
+    make_chunks: Callable[[], Iterator[bytes]]
+
+
+class SMTPConnection:
+    def __init__(self, server: str, port: int = 25) -> None:
+        self.server = server
+        self.port = port
+        self.smtp: smtplib.SMTP | None = None
+        self.connects = 0
+
+    def send(self, job: MailJob) -> SendErrors:
+        for attempt in range(2):
+            if self.smtp is None:
+                self.smtp = smtplib.SMTP(self.server, self.port)
+                self.connects += 1
+            try:
+                return send_stream(
+                    self.smtp, job.sender, job.recipients, job.make_chunks()
+                )
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                self.close()
+                if attempt > 0:
+                    raise
+                logging.warning(f"Connection to {self.server} lost. Reconnecting...")
+        return {}
+
+    def close(self) -> None:
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+
+
+class SMTPPool:
+    def __init__(self, server: str, port: int = 25, size: int = 1) -> None:
+        self.server = server
+        self.port = port
+        self.size = max(1, size)
+        self.connections: list[SMTPConnection] = []
+        self.idle: queue.SimpleQueue[SMTPConnection] = queue.SimpleQueue()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> SMTPConnection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            connection = SMTPConnection(self.server, self.port)
+            with self.lock:
+                self.connections.append(connection)
+            return connection
+
+    def send(self, job: MailJob) -> SendErrors | Exception:
+        connection = self.acquire()
+        try:
+            return connection.send(job)
+        except (smtplib.SMTPException, OSError) as err:
+            return err
+        finally:
+            self.idle.put(connection)
+
+    def send_all(self, jobs: list[MailJob]) -> list[SendErrors | Exception]:
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(self.send, jobs))
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.close()
+
+    def __enter__(self) -> "SMTPPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,176 @@
+import logging
+import posixpath
+import zipfile
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator
+
+from lxml import etree
+from python_calamine import CalamineWorkbook
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+ROW_TAG = f"{MAIN_NS}row"
+CELL_TAG = f"{MAIN_NS}c"
+VALUE_TAG = f"{MAIN_NS}v"
+TEXT_TAG = f"{MAIN_NS}t"
+RUN_TAG = f"{MAIN_NS}r"
+DIGITS = "0123456789"
+STREAM_MIN_FILE_SIZE = 16 * 2**20
+
+
+def read_relationships(archive: zipfile.ZipFile, part: str) -> dict[str, str]:
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", f"{name}.rels")
+    if rels_path not in archive.namelist():
+        return {}
+
+    relationships = {}
+    for rel in etree.fromstring(archive.read(rels_path)):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        relationships[rel.get("Id")] = target
+        relationships[rel.get("Type").rsplit("/", 1)[-1]] = target
+    return relationships
+
+
+def string_text(element: etree._Element) -> str | None:
+    if len(element) == 0:
+        return None
+    if element[0].tag == TEXT_TAG:
+        return element[0].text or ""
+    return "".join(run.findtext(TEXT_TAG) or "" for run in element.iter(RUN_TAG))
+
+
+def value_text(cell: etree._Element) -> str | None:
+    if len(cell) == 0:
+        return None
+    if cell[-1].tag == VALUE_TAG:
+        return cell[-1].text
+    return cell.findtext(VALUE_TAG)
+
+
+def read_shared_strings(archive: zipfile.ZipFile, path: str | None) -> list[str]:
+    if path is None:
+        return []
+
+    strings = []
+    with archive.open(path) as f:
+        for _, item in etree.iterparse(f, tag=f"{MAIN_NS}si"):
+            strings.append(string_text(item))
+            item.clear()
+    return strings
+
+
+def read_date_styles(archive: zipfile.ZipFile, path: str | None) -> set[str]:
+    if path is None:
+        return set()
+
+    styles = etree.fromstring(archive.read(path))
+    formats = dict(BUILTIN_FORMATS)
+    for num_fmt in styles.iter(f"{MAIN_NS}numFmt"):
+        formats[int(num_fmt.get("numFmtId"))] = num_fmt.get("formatCode")
+
+    cell_xfs = styles.find(f"{MAIN_NS}cellXfs")
+    if cell_xfs is None:
+        return set()
+    return {
+        str(idx)
+        for idx, xf in enumerate(cell_xfs)
+        if is_date_format(formats.get(int(xf.get("numFmtId", 0)), ""))
+    }
+
+
+@lru_cache(maxsize=None)
+def column_index(letters: str) -> int:
+    idx = 0
+    for letter in letters:
+        idx = idx * 26 + ord(letter) - 64
+    return idx - 1
+
+
+def iter_streamed_rows(file_path: Path) -> Iterator[tuple[int, list[Any]]]:
+    with zipfile.ZipFile(file_path) as archive:
+        workbook_path = read_relationships(archive, "")["officeDocument"]
+        workbook = etree.fromstring(archive.read(workbook_path))
+        workbook_rels = read_relationships(archive, workbook_path)
+
+        workbook_pr = workbook.find(f"{MAIN_NS}workbookPr")
+        is_1904 = workbook_pr is not None and workbook_pr.get("date1904") in (
+            "1",
+            "true",
+        )
+        epoch = CALENDAR_MAC_1904 if is_1904 else CALENDAR_WINDOWS_1900
+
+        first_sheet = next(workbook.iter(f"{MAIN_NS}sheet"))
+        sheet_path = workbook_rels[first_sheet.get(f"{REL_NS}id")]
+        shared_strings = read_shared_strings(
+            archive, workbook_rels.get("sharedStrings")
+        )
+        date_styles = read_date_styles(archive, workbook_rels.get("styles"))
+
+        with archive.open(sheet_path) as f:
+            row_number = 0
+            for _, row in etree.iterparse(f, tag=ROW_TAG):
+                row_number = int(row.get("r") or row_number + 1)
+                values: list[Any] = []
+                for cell in row.iterchildren(CELL_TAG):
+                    reference = cell.get("r")
+                    if reference is not None:
+                        idx = column_index(reference.rstrip(DIGITS))
+                        if idx > len(values):
+                            values.extend([None] * (idx - len(values)))
+
+                    cell_type = cell.get("t")
+                    if cell_type == "inlineStr":
+                        values.append(string_text(cell[0]) if len(cell) else None)
+                        continue
+
+                    text = value_text(cell)
+                    if text is None:
+                        values.append(None)
+                    elif cell_type is None or cell_type == "n":
+                        if cell.get("s") in date_styles:
+                            values.append(from_excel(float(text), epoch))
+                        else:
+                            values.append(float(text))
+                    elif cell_type == "s":
+                        values.append(shared_strings[int(text)])
+                    elif cell_type == "b":
+                        values.append(text == "1")
+                    elif cell_type == "d":
+                        values.append(datetime.fromisoformat(text))
+                    else:
+                        values.append(text)
+
+                yield row_number, values
+
+                row.clear()
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
+
+
+def iter_calamine_rows(file_path: Path) -> Iterator[tuple[int, list[Any]]]:
+    with CalamineWorkbook.from_path(str(file_path)) as workbook:
+        sheet = workbook.get_sheet_by_index(0)
+        padding = [""] * (sheet.start[1] if sheet.start else 0)
+        for sheet_row, row in enumerate(sheet.iter_rows(), start=1):
+            yield sheet_row, padding + row
+
+
+def iter_sheet_rows(
+    file_path: Path, stream_min_size: int = STREAM_MIN_FILE_SIZE
+) -> Iterator[tuple[int, list[Any]]]:
+    file_size = file_path.stat().st_size
+    if file_size < stream_min_size:
+        return iter_calamine_rows(file_path)
+
+    logging.info(f"Streaming {file_path.name} ({file_size / 2**20:.1f} MB)")
+    return iter_streamed_rows(file_path)
@@ -0,0 +1,45 @@
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import IO
+
+SPOOL_MAX_SIZE = 64 * 2**20
+COMPRESSED_SUFFIXES = {".docx", ".xlsx", ".zip", ".png", ".jpg", ".jpeg", ".pdf"}
+ZIP_ENTRY_OVERHEAD = 30 + 46
+ZIP_END_OVERHEAD = 22
+
+
+def stored_size(file_path: Path) -> int:
+    return (
+        file_path.stat().st_size
+        + ZIP_ENTRY_OVERHEAD
+        + 2 * len(file_path.name.encode("utf-8"))
+    )
+
+
+def split_by_size(file_paths: list[Path], max_size: int) -> list[list[Path]]:
+    groups: list[list[Path]] = [[]]
+    group_size = ZIP_END_OVERHEAD
+    for file_path in file_paths:
+        file_size = stored_size(file_path)
+        if groups[-1] and group_size + file_size > max_size:
+            groups.append([])
+            group_size = ZIP_END_OVERHEAD
+        groups[-1].append(file_path)
+        group_size += file_size
+    return groups
+
+
+def build_archive(file_paths: list[Path], spool_max_size: int = SPOOL_MAX_SIZE) -> IO:
+    archive_file = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    with zipfile.ZipFile(archive_file, "w") as archive:
+        for file_path in file_paths:
+            if file_path.suffix.lower() in COMPRESSED_SUFFIXES:
+                compress_type = zipfile.ZIP_STORED
+            else:
+                compress_type = zipfile.ZIP_DEFLATED
+            archive.write(
+                file_path, arcname=file_path.name, compress_type=compress_type
+            )
+    archive_file.seek(0)
+    return archive_file
@@ -0,0 +1,116 @@
+import logging
+import socket
+from typing import Iterator
+
+import pytest
+
+import src.notification as notification
+from benchmarks.telegram_stub import TelegramStub
+from src.notification import TelegramAPI
+
+TOKEN = "123456:stub-secret-token"
+
+
+@pytest.fixture(autouse=True)
+def telegram_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TOKEN", TOKEN)
+    monkeypatch.setenv("CHAT_ID", "0")
+    monkeypatch.setenv("TELEGRAM_RATE", "100")
+    monkeypatch.setattr(notification, "BACKOFF_BASE", 0.01)
+
+
+@pytest.fixture
+def stub() -> Iterator[TelegramStub]:
+    with TelegramStub() as stub:
+        yield stub
+
+
+def token_url(api_url: str) -> str:
+    return f"{api_url.removesuffix('botstub/')}bot{TOKEN}/"
+
+
+def create_bot(api_url: str) -> TelegramAPI:
+    bot = TelegramAPI()
+    bot.api_url = token_url(api_url)
+    return bot
+
+
+def request_statuses(stub: TelegramStub) -> list[int]:
+    return [status for _, status in stub.requests]
+
+
+def test_rate_limit_waits_retry_after(stub: TelegramStub) -> None:
+    stub.statuses = ["429:1"]
+    bot = create_bot(stub.api_url)
+
+    bot.send_message("rate limited")
+    assert bot.flush(timeout=30)
+
+    assert request_statuses(stub) == [429, 200]
+    assert stub.requests[1][0] - stub.requests[0][0] >= 1
+    assert stub.messages == ["rate limited"]
+
+
+def test_server_errors_are_retried(stub: TelegramStub) -> None:
+    stub.statuses = ["502", "503"]
+    bot = create_bot(stub.api_url)
+
+    bot.send_message("server error")
+    assert bot.flush(timeout=30)
+
+    assert request_statuses(stub) == [502, 503, 200]
+    assert stub.messages == ["server error"]
+
+
+@pytest.mark.parametrize("status", ["400", "403"])
+def test_client_errors_are_not_retried(stub: TelegramStub, status: str) -> None:
+    stub.statuses = [status]
+    bot = create_bot(stub.api_url)
+
+    bot.send_message("bad request")
+    assert bot.flush(timeout=30)
+
+    assert request_statuses(stub) == [int(status)]
+    assert stub.messages == []
+
+
+def test_token_bucket_spaces_requests(
+    stub: TelegramStub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    rate = 5
+    monkeypatch.setenv("TELEGRAM_RATE", str(rate))
+    bot = create_bot(stub.api_url)
+    capacity = bot.limiter.capacity
+
+    for idx in range(capacity + 4):
+        bot.send_message(f"message {idx}", use_md=True)
+    assert bot.flush(timeout=30)
+
+    times = [requested_at for requested_at, _ in stub.requests]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert len(times) == capacity + 4
+    assert times[-1] - times[0] >= 0.9 * 4 / rate
+    assert all(gap >= 0.9 / rate for gap in gaps[capacity:])
+
+
+def test_token_is_not_logged(
+    stub: TelegramStub, caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.DEBUG)
+    with socket.socket() as closed_port:
+        closed_port.bind(("127.0.0.1", 0))
+        closed_url = f"http://127.0.0.1:{closed_port.getsockname()[1]}/botstub/"
+
+    stub.statuses = ["502", "429:0", "400"]
+    bot = create_bot(stub.api_url)
+    bot.send_message("server errors")
+    assert bot.flush(timeout=30)
+
+    bot.api_url = token_url(closed_url)
+    bot.send_message("connection refused")
+    assert bot.flush(timeout=30)
+
+    assert "Giving up" in caplog.text
+    assert "rejected" in caplog.text
+    assert TOKEN not in caplog.text
+    assert "stub-secret-token" not in caplog.text